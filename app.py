@@ -1,11 +1,13 @@
 import sys
 import os
+import logging
 import threading
 import webbrowser
 import time
 import socket
+import multiprocessing
+import tempfile
 from contextlib import closing
-from openpyxl import Workbook, load_workbook
 
 # Check if we're running as a PyInstaller bundle
 if getattr(sys, 'frozen', False):
@@ -21,6 +23,16 @@ sys.path.insert(0, application_path)
 # Import Flask app components
 from flask import Flask, render_template, request, send_file, Response, jsonify
 from rfid_reader import RFIDReader
+from reader_manager import ReaderManager
+from metrics import PrometheusText
+from exporters import EXPORT_FORMATS
+from export_cache import ExportCache
+import export_worker
+from logging_setup import setup_logging, shutdown_logging
+from asgi_server import AsgiApp, serve
+from jobs import JobRunner
+from participants import RosterError
+import config
 import json
 
 # Find an available port
@@ -30,12 +42,21 @@ def find_free_port():
         s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         return s.getsockname()[1]
 
+# Participant rosters accepted by /import_participants
+ROSTER_EXTENSIONS = ('.xlsx', '.csv')
+
+# Seconds between keepalive comments on an idle /stream connection
+STREAM_KEEPALIVE = 15
+
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
 
-# Initialize RFID reader
+# Initialize RFID reader; extra gates (finish, splits) are added through the manager
 reader = RFIDReader()
+manager = ReaderManager(reader)
+jobs = JobRunner()  # Participant imports, exports and other long tasks
+exports = ExportCache(reader, jobs, os.path.join(application_path, config.EXPORT_DIR))
 
 @app.route('/')
 def index():
@@ -55,10 +76,12 @@ def update_settings():
     port = request.form['serial_port']
     baud_rate = int(request.form['baud_rate'])
     output_file = request.form['output_file']
+    gate = request.form.get('gate', reader.settings['gate'])
     
     success, message = reader.setup_connection(port, baud_rate)
     if success:
         reader.settings['output_file'] = output_file
+        reader.settings['gate'] = gate
     return jsonify({'success': success, 'message': message})
 
 @app.route('/start_reader')
@@ -73,7 +96,7 @@ def stop_reader():
 
 @app.route('/clear_data')
 def clear_data():
-    reader.clear_data()  # Call the clear_data method
+    manager.clear_data()  # Every reader's reads, not just the primary's
     return jsonify({'success': True, 'message': 'Data cleared successfully'})
 
 @app.route('/download_csv')
@@ -82,6 +105,7 @@ def download_csv():
 
 @app.route('/download_excel')
 def download_excel():
+    reader.export_excel()
     return send_file(reader.settings['output_file'], as_attachment=True)
 
 @app.route('/import_participants', methods=['POST'])
@@ -91,53 +115,167 @@ def import_participants():
     file = request.files['file']
     if file.filename == '':
         return jsonify({'success': False, 'message': 'No file selected'})
-    file_path = os.path.join(application_path, file.filename)
-    file.save(file_path)
-    reader.import_participants(file_path)
-    return jsonify({'success': True, 'message': 'Participant data imported successfully'})
+    extension = os.path.splitext(file.filename)[1].lower()
+    if extension not in ROSTER_EXTENSIONS:
+        return jsonify({'success': False, 'message': 'Upload an .xlsx or .csv file'}), 400
+    if jobs.active('import'):
+        return jsonify({'success': False, 'message': 'An import is already running'}), 409
+    # Keep the upload in a private temporary file; it is deleted when the import ends
+    fd, file_path = tempfile.mkstemp(suffix=extension)
+    with os.fdopen(fd, 'wb') as f:
+        file.save(f)
+    job = jobs.submit('import', run_import, file_path)
+    return jsonify({'success': True, 'job_id': job.id, 'message': 'Import started'}), 202
+
+def run_import(job, file_path):
+    try:
+        return {'imported': reader.import_participants(file_path, job.progress)}
+    except RosterError as e:
+        job.errors = [{'row': row, 'error': error} for row, error in e.errors]
+        raise
+    finally:
+        os.remove(file_path)
+
+@app.route('/import_participants/<job_id>')
+def import_status(job_id):
+    job = jobs.get(job_id)
+    if job is None or job.kind != 'import':
+        return jsonify({'success': False, 'message': 'Unknown import'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
 
 @app.route('/download_start')
 def download_start():
-    if not os.path.exists(reader.settings['output_file']):
-        return jsonify({'success': False, 'message': 'File does not exist'}), 404
-    return send_file(reader.settings['output_file'], as_attachment=True, download_name="start_data.xlsx")
+    return send_export('start')
 
 @app.route('/download_finish')
 def download_finish():
-    if not os.path.exists(reader.settings['output_file']):
-        return jsonify({'success': False, 'message': 'File does not exist'}), 404
-    return send_file(reader.settings['output_file'], as_attachment=True, download_name="finish_data.xlsx")
+    return send_export('finish')
 
 @app.route('/download_merged')
 def download_merged():
-    if not os.path.exists(reader.settings['output_file']):
-        return jsonify({'success': False, 'message': 'File does not exist'}), 404
-
-    # Fetch merged data
-    merged_data = reader.get_merged_data()
-
-    # Create a new workbook and add headers
-    workbook = Workbook()
-    sheet = workbook.active
-    sheet.append(["EPC", "NAMA", "BIB", "Start Timestamp", "Finish Timestamp", "Duration"])
-
-    # Add merged data to the sheet
-    for row in merged_data:
-        sheet.append([
-            row["EPC"],
-            row["NAMA"],
-            row["BIB"],
-            row["Start Timestamp"],
-            row["Finish Timestamp"],
-            row["Duration"]
-        ])
-
-    # Save the workbook to a temporary file
-    file_path = os.path.join(application_path, "merged_data.xlsx")
-    workbook.save(file_path)
-
-    # Send the file as a response
-    return send_file(file_path, as_attachment=True, download_name="merged_data.xlsx")
+    return send_export('merged')
+
+def send_export(dataset):
+    """Send ``dataset`` as ?format=xlsx|csv|json if an up-to-date copy is cached.
+
+    Otherwise the export is built by a background job and 202 is returned
+    with its id; /exports/<job_id> reports progress and, once it is done,
+    /exports/<job_id>/download sends the file.
+    """
+    fmt = request.args.get('format', 'xlsx')
+    try:
+        path, job = exports.get(dataset, fmt)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except (OSError, KeyError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+    if path:
+        return send_file(path, as_attachment=True, download_name=f"{dataset}_data.{fmt}",
+                         mimetype=EXPORT_FORMATS[fmt])
+    return jsonify({'success': True, 'job_id': job.id, 'message': 'Export started'}), 202
+
+@app.route('/exports/<job_id>')
+def export_status(job_id):
+    job = jobs.get(job_id)
+    if job is None or job.kind != 'export':
+        return jsonify({'success': False, 'message': 'Unknown export'}), 404
+    result = {'success': True, 'job': job.to_dict()}
+    if job.state == 'done':
+        result['download_url'] = f"/exports/{job.id}/download"
+    return jsonify(result)
+
+@app.route('/exports/<job_id>/download')
+def export_download(job_id):
+    job = jobs.get(job_id)
+    if job is None or job.kind != 'export' or job.state != 'done':
+        return jsonify({'success': False, 'message': 'Export is not ready'}), 404
+    dataset, fmt = job.result['dataset'], job.result['format']
+    # The newest file of this export: the job's own or one built after it
+    path = exports.latest(dataset, fmt)
+    if path is None:
+        return jsonify({'success': False, 'message': 'Export file is gone'}), 404
+    return send_file(path, as_attachment=True, download_name=f"{dataset}_data.{fmt}",
+                     mimetype=EXPORT_FORMATS[fmt])
+
+@app.route('/leaderboard')
+def leaderboard():
+    """Ranking by duration; ?gender= or ?category= selects a view, ?page=&per_page= a page."""
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(500, max(1, int(request.args.get('per_page', 50))))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'page and per_page must be integers'}), 400
+    board = reader.get_leaderboard()
+    rows, total = board.page(request.args.get('gender'), request.args.get('category'), page, per_page)
+    return jsonify({
+        'success': True,
+        'data': rows,
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'groups': board.groups()
+    })
+
+@app.route('/readers')
+def list_readers():
+    """Health and throughput of every reader."""
+    return jsonify(manager.health())
+
+@app.route('/ingest_delay')
+def ingest_delay():
+    """Ingest-to-decode delay per reader; ?start=1 (re)starts the measurement, ?stop=1 ends it."""
+    result = {}
+    for reader_id, gate_reader in list(manager.readers.items()):
+        if request.args.get('start'):
+            gate_reader.measure_ingest_delay()
+        if request.args.get('stop'):
+            result[reader_id] = gate_reader.measure_ingest_delay(False)
+        else:
+            sampler = gate_reader.ingest_delay
+            result[reader_id] = sampler.summary() if sampler else None
+    return jsonify({'success': True, 'data': result})
+
+@app.route('/readers/add', methods=['POST'])
+def add_reader():
+    success, message = manager.add_reader(
+        request.form['reader_id'],
+        request.form['gate'],
+        request.form['serial_port'],
+        int(request.form.get('baud_rate', 57600))
+    )
+    return jsonify({'success': success, 'message': message})
+
+@app.route('/readers/<reader_id>/start')
+def start_gate_reader(reader_id):
+    gate_reader = manager.get(reader_id)
+    if not gate_reader:
+        return jsonify({'success': False, 'message': f'Unknown reader {reader_id}'}), 404
+    success, message = gate_reader.start()
+    return jsonify({'success': success, 'message': message})
+
+@app.route('/readers/<reader_id>/stop')
+def stop_gate_reader(reader_id):
+    gate_reader = manager.get(reader_id)
+    if not gate_reader:
+        return jsonify({'success': False, 'message': f'Unknown reader {reader_id}'}), 404
+    success, message = gate_reader.stop()
+    return jsonify({'success': success, 'message': message})
+
+@app.route('/readers/<reader_id>/remove')
+def remove_gate_reader(reader_id):
+    success, message = manager.remove_reader(reader_id)
+    return jsonify({'success': success, 'message': message})
+
+@app.route('/readers/start_all')
+def start_all_readers():
+    results = manager.start_all()
+    return jsonify({'success': all(ok for ok, _ in results.values()),
+                    'message': {reader_id: message for reader_id, (ok, message) in results.items()}})
+
+@app.route('/readers/stop_all')
+def stop_all_readers():
+    manager.stop_all()
+    return jsonify({'success': True, 'message': 'All readers stopped'})
 
 @app.route('/retry_missed_tags')
 def retry_missed_tags():
@@ -147,51 +285,72 @@ def retry_missed_tags():
 @app.route('/get_participants')
 def get_participants():
     try:
-        if not os.path.exists(reader.settings['output_file']):
-            return jsonify({'success': False, 'message': 'File does not exist', 'data': []})
-
-        workbook = load_workbook(reader.settings['output_file'])
-        if "Participants" not in workbook.sheetnames:
-            return jsonify({'success': False, 'message': 'Participants sheet does not exist', 'data': []})
-
-        sheet = workbook["Participants"]
-        participants = []
-        for row in sheet.iter_rows(min_row=2, values_only=True):  # Skip header row
-            participants.append({
-                "Member NO": row[0],
-                "Nama": row[1],
-                "Alamat": row[2],
-                "Gender": row[3],
-                "EPC": row[4],
-                "Country": row[5],
-                "Status": row[6]
-            })
-        return jsonify({'success': True, 'data': participants})
+        participants = reader.load_participants()  # Served from memory unless the file changed
+        return jsonify({'success': True, 'data': participants.records})
+    except FileNotFoundError:
+        return jsonify({'success': False, 'message': 'File does not exist', 'data': []})
+    except KeyError:
+        return jsonify({'success': False, 'message': 'Participants sheet does not exist', 'data': []})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e), 'data': []})
 
 @app.route('/stream')
 def stream():
-    def event_stream():
+    cursor, greeting = stream_start(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+
+    def event_stream(cursor, greeting):
+        if greeting:
+            yield greeting
         while True:
-            data = json.dumps({
-                'data': reader.get_data(),
-                'stats': reader.get_stats(),
-                'is_running': reader.running  # Add reader status
-            })
-            yield f"data: {data}\n\n"
-            threading.Event().wait(0.5)
-    return Response(event_stream(), mimetype="text/event-stream")
+            messages, cursor = reader.feed.read(cursor, timeout=STREAM_KEEPALIVE)
+            if messages is None:
+                # Fell behind the retained log: start over from a snapshot
+                cursor, greeting = stream_start(None)
+                yield greeting
+            elif messages:
+                yield ''.join(messages)
+            else:
+                yield ": keepalive\n\n"
+    return Response(event_stream(cursor, greeting), mimetype="text/event-stream")
+
+def stream_start(last_event_id):
+    """Cursor a /stream connection resumes from, and the message to send first (or None).
+
+    Browsers send Last-Event-ID when they reconnect, so they only get what
+    they missed; shared by the threaded and the async server.
+    """
+    try:
+        cursor = int(last_event_id or 0)
+    except ValueError:
+        cursor = 0
+    if cursor > 0 and reader.feed.covers(cursor):
+        return cursor, None
+    # New client, or one older than the retained log: replace its table with a snapshot
+    cursor, records = reader.feed.position()
+    return cursor, f"id: {cursor}\ndata: {json.dumps(manager.stream_reset(records))}\n\n"
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus scrape target: counters and latency histograms of every reader
+    return Response(manager.metrics_text(), content_type=PrometheusText.CONTENT_TYPE)
 
 def run_flask_app(port):
     app.run(host='127.0.0.1', port=port, debug=False)
 
+def run_async_app(port):
+    # One event loop serves every /stream client; other routes run on a thread pool
+    serve(AsgiApp(app, reader.feed, stream_start, STREAM_KEEPALIVE), '127.0.0.1', port)
+
 def main():
+    # Log through a background thread so console/file output never blocks the readers
+    setup_logging()
+
     # Find an available port
     port = find_free_port()
     
     # Start the Flask app in a separate thread
-    flask_thread = threading.Thread(target=run_flask_app, args=(port,))
+    target = run_async_app if config.WEB_SERVER == 'async' else run_flask_app
+    flask_thread = threading.Thread(target=target, args=(port,))
     flask_thread.daemon = True
     flask_thread.start()
     
@@ -207,11 +366,14 @@ def main():
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
-        print("Shutting down...")
+        logging.getLogger(__name__).info("Shutting down...")
         # Clean up resources
-        if reader.running:
-            reader.stop()
+        manager.stop_all()
+        export_worker.shutdown()
+        exports.clear()
+        shutdown_logging()
         sys.exit(0)
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # Worker processes of the frozen (PyInstaller) app start here
     main()
\ No newline at end of file
@@ -0,0 +1,299 @@
+import asyncio
+import io
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote
+
+import config
+
+log = logging.getLogger(__name__)
+
+WSGI_CHUNK = 64 * 1024  # Bytes collected from a WSGI response per hop to the thread pool
+
+
+class FeedNotifier:
+    """Wakes the /stream coroutines of one event loop when the feed changes.
+
+    Publishing threads only schedule a wake-up when none is pending, so a
+    burst of reads costs the loop one callback, not one per read.
+    """
+
+    def __init__(self, feed, loop):
+        self.loop = loop
+        self.changed = loop.create_future()
+        self.wake_pending = False
+        feed.subscribe(self._published)
+
+    def _published(self):
+        if not self.wake_pending:
+            self.wake_pending = True
+            self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        self.wake_pending = False
+        changed, self.changed = self.changed, self.loop.create_future()
+        changed.set_result(None)
+
+
+class AsgiApp:
+    """ASGI 3 application serving ``/stream`` natively and everything else from ``wsgi_app``.
+
+    Every /stream connection is a coroutine waiting on the shared
+    UpdateFeed, so hundreds of spectator and timing screens cost no thread
+    each. The other routes are the unchanged Flask views, run on a small
+    thread pool.
+    """
+
+    def __init__(self, wsgi_app, feed, stream_start, keepalive=15, workers=config.ASYNC_WORKERS):
+        self.wsgi_app = wsgi_app
+        self.feed = feed
+        self.stream_start = stream_start  # app.stream_start: (cursor, first message) for a new connection
+        self.keepalive = keepalive
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='wsgi')
+        self.notifier = None
+        self.clients = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            if scope['path'] == '/stream':
+                await self.stream(scope, receive, send)
+            else:
+                await self.call_wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def stream(self, scope, receive, send):
+        if self.notifier is None:
+            self.notifier = FeedNotifier(self.feed, asyncio.get_running_loop())
+        headers = dict(scope['headers'])
+        last_event_id = headers.get(b'last-event-id', b'').decode('latin-1')
+        if not last_event_id:
+            last_event_id = parse_qs(scope['query_string'].decode('latin-1')).get('last_event_id', [None])[0]
+        # The snapshot for a new client formats and serializes every read: not on the loop
+        loop = asyncio.get_running_loop()
+        cursor, greeting = await loop.run_in_executor(self.executor, self.stream_start, last_event_id)
+
+        # A client going away shows up as http.disconnect on receive()
+        disconnected = asyncio.ensure_future(self._wait_disconnect(receive))
+        self.clients += 1
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache')]
+            })
+            if greeting:
+                await self._send_text(send, greeting)
+            while not disconnected.done():
+                changed = self.notifier.changed  # Taken before reading, so no publish is missed
+                messages, cursor = self.feed.read(cursor, timeout=0)
+                if messages is None:
+                    # Fell behind the retained log: start over from a snapshot
+                    cursor, greeting = await loop.run_in_executor(self.executor, self.stream_start, None)
+                    await self._send_text(send, greeting)
+                    continue
+                if messages:
+                    await self._send_text(send, ''.join(messages))
+                    continue
+                done, _ = await asyncio.wait([changed, disconnected], timeout=self.keepalive,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    await self._send_text(send, ": keepalive\n\n")
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.clients -= 1
+            disconnected.cancel()
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    @staticmethod
+    async def _send_text(send, text):
+        await send({'type': 'http.response.body', 'body': text.encode('utf-8'), 'more_body': True})
+
+    async def call_wsgi(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        loop = asyncio.get_running_loop()
+        environ = wsgi_environ(scope, bytes(body))
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+            return lambda data: None  # The legacy write() callable is not used by Flask
+
+        def run():
+            result = self.wsgi_app(environ, start_response)
+            return result, iter(result)
+
+        result, chunks = await loop.run_in_executor(self.executor, run)
+        try:
+            await send({'type': 'http.response.start', 'status': response['status'],
+                        'headers': response['headers']})
+            while True:
+                # Streamed responses (CSV export, send_file) are pulled in chunks off the loop
+                data = await loop.run_in_executor(self.executor, read_chunk, chunks)
+                if not data:
+                    break
+                await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            if hasattr(result, 'close'):
+                await loop.run_in_executor(self.executor, result.close)
+
+
+def read_chunk(chunks, limit=WSGI_CHUNK):
+    """Join WSGI response chunks until ``limit`` bytes or the end (b'')."""
+    data = bytearray()
+    for chunk in chunks:
+        data += chunk
+        if len(data) >= limit:
+            break
+    return bytes(data)
+
+
+def wsgi_environ(scope, body):
+    """WSGI environ for an ASGI http scope."""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'CONTENT_LENGTH': str(len(body)),
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = 'HTTP_' + name
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def handle_connection(asgi_app, reader, writer, server_address):
+    """Serve one HTTP/1.1 request on a connection (Connection: close) through ``asgi_app``."""
+    try:
+        request_line = await reader.readline()
+        if not request_line:
+            return
+        method, target, version = request_line.decode('latin-1').split()
+        headers = []
+        length = 0
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.partition(b':')
+            name, value = name.strip().lower(), value.strip()
+            headers.append((name, value))
+            if name == b'content-length':
+                length = int(value)
+        body = await reader.readexactly(length) if length else b''
+    except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+        writer.close()
+        return
+
+    path, _, query = target.partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': version.split('/', 1)[-1],
+        'method': method,
+        'scheme': 'http',
+        'path': unquote(path),
+        'raw_path': path.encode('latin-1'),
+        'query_string': query.encode('latin-1'),
+        'root_path': '',
+        'headers': headers,
+        'client': writer.get_extra_info('peername'),
+        'server': server_address
+    }
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        await reader.read()  # Returns at EOF, i.e. when the client hangs up
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if writer.is_closing():
+            raise ConnectionResetError("Client disconnected")
+        if message['type'] == 'http.response.start':
+            status = message['status']
+            lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}".encode('latin-1')]
+            lines += [name + b': ' + value for name, value in message.get('headers', [])
+                      if name != b'connection']
+            lines.append(b'Connection: close')
+            writer.write(b'\r\n'.join(lines) + b'\r\n\r\n')
+        elif message['type'] == 'http.response.body':
+            writer.write(message.get('body', b''))
+            await writer.drain()
+
+    try:
+        await asgi_app(scope, receive, send)
+    except Exception:
+        log.exception("Error serving %s %s", method, target)
+    finally:
+        writer.close()
+
+
+async def serve_builtin(asgi_app, host, port):
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_connection(asgi_app, reader, writer, (host, port)), host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def serve(asgi_app, host, port):
+    """Run ``asgi_app`` until interrupted, with uvicorn if it is installed."""
+    try:
+        import uvicorn
+    except ImportError:
+        uvicorn = None
+    if uvicorn:
+        uvicorn.run(asgi_app, host=host, port=port, log_level='warning')
+    else:
+        asyncio.run(serve_builtin(asgi_app, host, port))
@@ -0,0 +1,90 @@
+"""Frame parser throughput benchmark.
+
+Usage:
+    python benchmarks/bench_frame_parser.py [capture.bin ...]
+
+Each capture is a raw byte log recorded from the reader. Without
+arguments a noisy synthetic stream is generated. The stream is fed to
+the parser in serial-sized chunks and frames per second are reported for
+the streaming FrameDecoder and for the old slice-per-offset loop.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from frame_parser import FrameDecoder, encode_frame, frame_checksum
+
+
+def synthetic_stream(num_frames=200000, num_tags=5000, noise=0.05, seed=1):
+    """Build a byte stream of valid frames with random garbage mixed in."""
+    rng = random.Random(seed)
+    epcs = [rng.randbytes(12) for _ in range(num_tags)]
+    out = bytearray()
+    for _ in range(num_frames):
+        if rng.random() < noise:
+            out += rng.randbytes(rng.randint(1, 30))
+        out += encode_frame(rng.choice(epcs), rng.randint(30, 90), rng.randint(1, 4))
+    return bytes(out)
+
+
+def chunked(stream, size):
+    return [stream[i:i + size] for i in range(0, len(stream), size)]
+
+
+def legacy_parse(chunks):
+    """The original process_queue loop, with the same frame validation."""
+    size = config.FRAME_LENGTH
+    frames = 0
+    buffer = bytearray()
+    for data in chunks:
+        buffer.extend(data)
+        i = 0
+        while len(buffer) - i >= size:
+            packet = buffer[i:i + size]
+            if (packet[0] == config.FRAME_HEADER and packet[1] == size - 2
+                    and frame_checksum(packet) == packet[-1]):
+                frames += 1
+                i += size
+            else:
+                i += 1
+        if i > 0:
+            buffer = buffer[i:]
+    return frames
+
+
+def decoder_parse(chunks):
+    decoder = FrameDecoder()
+    frames = 0
+    for data in chunks:
+        for frame in decoder.feed(data):
+            frames += 1
+    return frames
+
+
+def run(name, parse, chunks):
+    start = time.perf_counter()
+    frames = parse(chunks)
+    elapsed = time.perf_counter() - start
+    print(f"  {name:<14} {frames:>9} frames  {elapsed:8.3f} s  {frames / elapsed:>12,.0f} frames/s")
+
+
+def main(paths):
+    if paths:
+        streams = [(path, open(path, 'rb').read()) for path in paths]
+    else:
+        streams = [(f'synthetic, {noise:.0%} noise', synthetic_stream(noise=noise))
+                   for noise in (0.0, 0.05, 0.5)]
+
+    for name, stream in streams:
+        chunks = chunked(stream, config.READ_CHUNK_SIZE)
+        print(f"{name}: {len(stream):,} bytes in {len(chunks):,} chunks")
+        run('FrameDecoder', decoder_parse, chunks)
+        run('legacy slicing', legacy_parse, chunks)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
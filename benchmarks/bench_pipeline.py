@@ -0,0 +1,219 @@
+"""End-to-end ingest benchmark: bytes -> process_queue -> process_data -> storage -> /stream feed.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--tags 100 1000 10000 50000] [--rate 20000]
+                                        [--baseline benchmarks/baseline.json] [--save-baseline]
+                                        [--fail-on-regression]
+
+For every tag population a synthetic stream (``--repeats`` reads per tag)
+is pushed through a real RFIDReader over the simulator transport, with the
+CSV writer and result journal running in a temporary directory. Three
+runs are made per population:
+
+  throughput  unpaced feed: frames/s and CPU seconds (all threads)
+  latency     feed paced at --rate: tag-to-UI latency p50/p99, measured
+              from the chunk carrying a tag's first read to the moment
+              the /stream feed delivers that tag
+  memory      unpaced feed under tracemalloc: peak traced memory
+
+Results can be saved as a baseline and later runs compared against it.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rfid_reader import RFIDReader
+from simulator import SimulatedTransport, TagSimulator
+from frame_parser import encode_frame
+from tag_store import TagStore
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+CHUNK_FRAMES = 195  # ~4 KB per chunk, like a busy serial read
+# metric -> True if higher is better
+METRICS = {
+    'frames_per_second': True,
+    'cpu_seconds': False,
+    'latency_p50_ms': False,
+    'latency_p99_ms': False,
+    'peak_memory_mb': False,
+}
+
+
+def build_chunks(num_tags, repeats, antennas=4):
+    """Chunks of frames plus, per chunk, the EPCs whose first read it carries."""
+    rng = TagSimulator(seed=num_tags).rng
+    chunks = []
+    firsts = []
+    frames = bytearray()
+    new_epcs = []
+    count = 0
+    for index in range(num_tags):
+        epc = TagSimulator.epc(index)
+        new_epcs.append(epc.hex().upper())
+        for _ in range(repeats):
+            frames += encode_frame(epc, rng.randint(40, 80), rng.randint(1, antennas))
+            count += 1
+            if count == CHUNK_FRAMES:
+                chunks.append(bytes(frames))
+                firsts.append(new_epcs)
+                frames, new_epcs, count = bytearray(), [], 0
+    if frames:
+        chunks.append(bytes(frames))
+        firsts.append(new_epcs)
+    return chunks, firsts
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_once(chunks, firsts, num_tags, rate=None, track_latency=False):
+    """Feed ``chunks`` through a fresh reader; returns (elapsed, cpu, frames, latencies_ms)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        reader = RFIDReader()
+        reader.settings['output_file'] = os.path.join(tmp, 'rfid_data.xlsx')
+        reader.settings['csv_file'] = os.path.join(tmp, 'rfid_data.csv')
+        reader.settings['journal_file'] = os.path.join(tmp, 'rfid_events.db')
+        reader.settings['read_journal_file'] = os.path.join(tmp, 'rfid_reads.journal')
+        reader.tag_store = TagStore(pass_window=0)  # Report first reads: a pass window would add its own delay
+        transport = SimulatedTransport()
+        reader.attach_transport(transport)
+
+        fed_at = {}
+        delivered = []
+        done = threading.Event()
+
+        def ui_client():
+            # Consumes the feed exactly like a /stream connection
+            cursor = reader.feed.last_id
+            seen = 0
+            while seen < num_tags:
+                messages, cursor = reader.feed.read(cursor, timeout=1)
+                messages = messages or ()  # None: fell behind the retained log
+                now = time.monotonic_ns()
+                for message in messages:
+                    payload = json.loads(message.split('data: ', 1)[1])
+                    for record in payload['data']:
+                        seen += 1
+                        if track_latency and record['epc'] in fed_at:
+                            delivered.append((now - fed_at[record['epc']]) / 1e6)
+                if not messages and done.is_set():
+                    break
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            reader.start()
+            client = threading.Thread(target=ui_client, daemon=True)
+            client.start()
+            interval = CHUNK_FRAMES / rate if rate else 0
+            cpu_start = time.process_time()
+            start = time.monotonic()
+            for index, chunk in enumerate(chunks):
+                if interval:
+                    delay = start + index * interval - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                if track_latency:
+                    stamp = time.monotonic_ns()
+                    for epc in firsts[index]:
+                        fed_at[epc] = stamp
+                transport.feed(chunk)
+            client.join(timeout=120)
+            elapsed = time.monotonic() - start
+            cpu = time.process_time() - cpu_start
+            done.set()
+            frames = reader.frames_read
+            reader.stop()
+            if reader.journal:
+                reader.journal.close()
+    return elapsed, cpu, frames, delivered
+
+
+def bench_population(num_tags, repeats, rate):
+    chunks, firsts = build_chunks(num_tags, repeats)
+
+    elapsed, cpu, frames, _ = run_once(chunks, firsts, num_tags)
+    _, _, _, latencies = run_once(chunks, firsts, num_tags, rate=rate, track_latency=True)
+
+    tracemalloc.start()
+    run_once(chunks, firsts, num_tags)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'frames': frames,
+        'frames_per_second': round(frames / elapsed, 1),
+        'cpu_seconds': round(cpu, 3),
+        'latency_p50_ms': round(percentile(latencies, 50), 3),
+        'latency_p99_ms': round(percentile(latencies, 99), 3),
+        'peak_memory_mb': round(peak / 1e6, 2),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print the change against ``baseline``; returns True if any metric regressed."""
+    regressed = False
+    for tags, metrics in results.items():
+        base = baseline.get(tags)
+        if not base:
+            continue
+        for name, higher_is_better in METRICS.items():
+            old, new = base.get(name), metrics.get(name)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change < -threshold if higher_is_better else change > threshold
+            regressed |= worse
+            flag = '  REGRESSION' if worse else ''
+            print(f"  {tags:>6} tags  {name:<18} {old:>12} -> {new:>12}  ({change:+.1%}){flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tags', type=int, nargs='+', default=[100, 1000, 10000, 50000])
+    parser.add_argument('--repeats', type=int, default=5, help="Reads per tag")
+    parser.add_argument('--rate', type=int, default=20000, help="Reads/s for the latency run")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=0.10, help="Relative change counted as a regression")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'tags':>6} {'frames':>9} {'frames/s':>12} {'cpu s':>8} {'p50 ms':>8} {'p99 ms':>8} {'peak MB':>8}")
+    for num_tags in args.tags:
+        r = bench_population(num_tags, args.repeats, args.rate)
+        results[str(num_tags)] = r
+        print(f"{num_tags:>6} {r['frames']:>9} {r['frames_per_second']:>12,.0f} {r['cpu_seconds']:>8.2f} "
+              f"{r['latency_p50_ms']:>8.2f} {r['latency_p99_ms']:>8.2f} {r['peak_memory_mb']:>8.2f}")
+
+    regressed = False
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.baseline}:")
+        regressed = compare(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if regressed and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
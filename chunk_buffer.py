@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import deque
+
+import config
+
+OVERFLOW_POLICIES = ('drop-oldest', 'coalesce', 'block')
+
+
+class ChunkBuffer:
+    """Bounded handoff of raw chunks from the read thread to the processing thread.
+
+    At most ``max_chunks`` chunks and ``max_bytes`` bytes are held. When a
+    new chunk does not fit, ``policy`` decides:
+
+    ``drop-oldest``  discard the oldest chunks until it fits (freshest
+                     data wins; the decoder resyncs on the next header)
+    ``coalesce``     append it to the newest chunk when only the chunk
+                     slots are exhausted; drop it if the bytes are
+    ``block``        make the read thread wait for room, leaving the
+                     backlog to the OS serial buffer
+
+    Every discarded byte is counted. ``get_batch`` blocks until data is
+    there and then takes everything at once, so a consumer that fell
+    behind catches up with one lock round trip instead of one per chunk.
+    """
+
+    def __init__(self, max_chunks=config.DATA_QUEUE_CHUNKS, max_bytes=config.DATA_QUEUE_MAX_BYTES,
+                 policy=config.DATA_QUEUE_POLICY):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy!r}; use one of {', '.join(OVERFLOW_POLICIES)}")
+        self.max_chunks = max_chunks
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.cond = threading.Condition()
+        self.chunks = deque()  # (arrival_ns, data)
+        self.bytes = 0
+        self.closed = False
+        self.dropped_bytes = 0
+        self.dropped_chunks = 0
+        self.coalesced_chunks = 0
+        self.blocked_ns = 0  # Time put() spent waiting for room (block policy)
+        self.high_water_bytes = 0
+
+    def put(self, arrival_ns, data):
+        """Hand over one chunk. Returns False if (part of) the data had to be dropped."""
+        size = len(data)
+        with self.cond:
+            chunks = self.chunks
+            complete = True
+            if size > self.max_bytes:
+                # Could never fit: keep only its newest bytes
+                self.dropped_bytes += size - self.max_bytes
+                data = data[-self.max_bytes:]
+                size = self.max_bytes
+                complete = False
+            if len(chunks) >= self.max_chunks or self.bytes + size > self.max_bytes:
+                action = self._make_room(size)
+                if action is None:
+                    # Coalesced into the newest chunk, which keeps its own (older) stamp. Restamping
+                    # would make its earlier frames late by the whole backlog; this way only the
+                    # appended bytes are stamped early, by the time since that chunk arrived
+                    newest_ns, newest = chunks[-1]
+                    if not isinstance(newest, bytearray):
+                        newest = bytearray(newest)
+                    newest += data
+                    chunks[-1] = (newest_ns, newest)
+                    self.coalesced_chunks += 1
+                    data = None
+                elif not action:
+                    return False
+            if data is not None:
+                chunks.append((arrival_ns, data))
+            self.bytes += size
+            if self.bytes > self.high_water_bytes:
+                self.high_water_bytes = self.bytes
+            self.cond.notify()
+            return complete
+
+    def _make_room(self, size):
+        """Apply the overflow policy. True: append, False: drop ``size`` bytes, None: coalesce."""
+        chunks = self.chunks
+        if self.policy == 'drop-oldest':
+            while chunks and (len(chunks) >= self.max_chunks or self.bytes + size > self.max_bytes):
+                _, dropped = chunks.popleft()
+                self.bytes -= len(dropped)
+                self.dropped_bytes += len(dropped)
+                self.dropped_chunks += 1
+            return True
+        if self.policy == 'coalesce':
+            if self.bytes + size <= self.max_bytes:
+                return None
+        else:
+            start = time.monotonic_ns()
+            while not self.closed and (len(chunks) >= self.max_chunks or self.bytes + size > self.max_bytes):
+                self.cond.wait(config.READ_TIMEOUT)
+            self.blocked_ns += time.monotonic_ns() - start
+            if not self.closed:
+                return True
+        self.dropped_bytes += size
+        self.dropped_chunks += 1
+        return False
+
+    def get_batch(self, timeout=None):
+        """Wait up to ``timeout`` for data, then return every queued ``(arrival_ns, data)`` (maybe [])."""
+        with self.cond:
+            if not self.chunks and not self.closed:
+                self.cond.wait(timeout)
+            batch = list(self.chunks)
+            self.chunks.clear()
+            self.bytes = 0
+            self.cond.notify_all()  # Room for a blocked put()
+            return batch
+
+    def close(self):
+        """Release a put() blocked on a full buffer, e.g. when the reader stops."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def reopen(self):
+        with self.cond:
+            self.closed = False
+
+    def qsize(self):
+        return len(self.chunks)
+
+    def stats(self):
+        return {
+            'policy': self.policy,
+            'chunks': len(self.chunks),
+            'bytes': self.bytes,
+            'high_water_bytes': self.high_water_bytes,
+            'dropped_bytes': self.dropped_bytes,
+            'dropped_chunks': self.dropped_chunks,
+            'coalesced_chunks': self.coalesced_chunks,
+            'blocked_ms': round(self.blocked_ns / 1e6, 3)
+        }
@@ -0,0 +1,67 @@
+import time
+
+
+def measure_offset(samples=9):
+    """Return ``(offset_ns, uncertainty_ns)`` between ``time.time_ns()`` and ``time.monotonic_ns()``.
+
+    Each sample brackets one wall-clock read between two monotonic reads;
+    the narrowest bracket wins, so a preemption during one sample does not
+    skew the result.
+    """
+    best = None
+    for _ in range(samples):
+        before = time.monotonic_ns()
+        wall = time.time_ns()
+        after = time.monotonic_ns()
+        if best is None or after - before < best[1]:
+            best = (wall - (before + after) // 2, after - before)
+    return best
+
+
+class WallClock:
+    """Maps monotonic read stamps to epoch nanoseconds with one calibrated offset.
+
+    Reads are stamped with ``time.monotonic_ns()``, which never jumps, and
+    converted with the offset measured by ``calibrate`` (at reader start),
+    so all reads of a run share one time base while NTP nudges the system
+    clock. ``stats`` reports how far the wall clock has drifted from that
+    base since; ``resync`` moves the base when the drift gets large, as it
+    does after a suspend.
+    """
+
+    def __init__(self):
+        self.calibrate()
+
+    def calibrate(self):
+        self.offset_ns, self.uncertainty_ns = measure_offset()
+        self.calibrated_at = time.monotonic_ns()
+
+    def resync(self, threshold_ns):
+        """Recalibrate if the wall clock moved more than ``threshold_ns`` from our time base.
+
+        The monotonic clock stops while the machine is suspended, so after
+        a laptop sleep every stamp would be early by the length of the
+        sleep. Returns the step in ns (0 if none was needed).
+        """
+        offset_ns, _ = measure_offset(3)
+        step_ns = offset_ns - self.offset_ns
+        if abs(step_ns) <= threshold_ns:
+            return 0
+        self.calibrate()
+        return step_ns
+
+    def to_wall(self, monotonic_ns):
+        return monotonic_ns + self.offset_ns
+
+    def now(self):
+        """Current time in epoch ns on this clock's time base."""
+        return time.monotonic_ns() + self.offset_ns
+
+    def stats(self):
+        offset_ns, _ = measure_offset(3)
+        return {
+            'offset_ns': self.offset_ns,
+            'uncertainty_us': round(self.uncertainty_ns / 1000, 3),
+            'drift_ms': round((offset_ns - self.offset_ns) / 1e6, 3),  # Wall clock minus our time base
+            'calibrated_s_ago': round((time.monotonic_ns() - self.calibrated_at) / 1e9, 1)
+        }
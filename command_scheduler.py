@@ -0,0 +1,172 @@
+import time
+import logging
+import threading
+from queue import Queue, Empty
+
+import config
+from metrics import LatencyStats
+
+log = logging.getLogger(__name__)
+
+REFRESH = object()  # Queue marker: run the inventory refresh sequence now
+
+
+class Command:
+    """A command queued for the reader: raw bytes, or a callable run in order with them."""
+
+    __slots__ = ('name', 'data', 'wait_ack', 'done', 'acked')
+
+    def __init__(self, name, data, wait_ack=True):
+        self.name = name
+        self.data = data
+        self.wait_ack = wait_ack
+        self.done = threading.Event()
+        self.acked = False
+
+
+class CommandScheduler:
+    """Owns the write side of the reader link.
+
+    Commands are written one at a time from a dedicated thread, so the
+    read thread never stops draining the port. After each write the
+    scheduler waits for the reader's response frame (handed over by the
+    processing thread through ``on_response``) rather than sleeping for a
+    fixed time; if none arrives within ``ack_timeout`` it carries on.
+
+    Inventory is refreshed adaptively: while tags are being read the
+    refresh is postponed (restarting would only open a gap), and it is
+    forced once no tag has been seen for ``refresh_min`` seconds or
+    ``refresh_max`` seconds have passed since the last refresh.
+    """
+
+    def __init__(self, transport, refresh_commands=None, ack_timeout=config.COMMAND_ACK_TIMEOUT,
+                 refresh_min=config.INVENTORY_REFRESH_MIN, refresh_max=config.INVENTORY_REFRESH_MAX):
+        self.transport = transport
+        self.refresh_commands = refresh_commands  # Callable returning the inventory (re)start commands
+        self.ack_timeout = ack_timeout
+        self.refresh_min = refresh_min
+        self.refresh_max = refresh_max
+        self.queue = Queue()
+        self.pending_ack = None
+        self.ack_lock = threading.Lock()
+        self.ack_latency = LatencyStats()
+        self.reads = 0  # Tag frames seen; incremented by the processing thread
+        self.commands_sent = 0
+        self.ack_timeouts = 0
+        self.refreshes = 0
+        self.last_refresh = time.monotonic()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2):
+        """Stop after the command currently being sent; queued commands are dropped."""
+        self.running = False
+        self.queue.put(None)
+        if self.thread:
+            self.thread.join(timeout=timeout)
+
+    def submit(self, name, data, wait_ack=True):
+        """Queue a command and return it; ``command.done`` is set once it was handled."""
+        command = Command(name, data, wait_ack)
+        self.queue.put(command)
+        return command
+
+    def request_refresh(self):
+        """Queue an inventory refresh behind any commands already waiting."""
+        self.queue.put(REFRESH)
+
+    def on_response(self, frame):
+        """Called with every non-tag frame the reader sends back."""
+        with self.ack_lock:
+            command = self.pending_ack
+            self.pending_ack = None
+        if command:
+            command.acked = True
+            command.done.set()
+
+    def note_read(self):
+        self.reads += 1
+
+    def stats(self):
+        return {
+            'commands_sent': self.commands_sent,
+            'ack_timeouts': self.ack_timeouts,
+            'refreshes': self.refreshes,
+            'queue_depth': self.queue.qsize(),
+            'ack_latency': self.ack_latency.snapshot()
+        }
+
+    def _run(self):
+        reads_at_check = self.reads
+        last_read_time = time.monotonic()
+        while self.running:
+            try:
+                command = self.queue.get(timeout=min(1.0, self.refresh_min))
+            except Empty:
+                command = None
+            if not self.running:
+                break
+            if command is REFRESH:
+                self.refresh()
+                continue
+            if command:
+                self._send(command)
+                continue
+
+            # Idle: decide whether inventory needs a refresh
+            now = time.monotonic()
+            if self.reads != reads_at_check:
+                reads_at_check = self.reads
+                last_read_time = now
+            quiet = now - last_read_time >= self.refresh_min
+            overdue = now - self.last_refresh >= self.refresh_max
+            if self.refresh_commands and now - self.last_refresh >= self.refresh_min and (quiet or overdue):
+                self.refresh()
+
+    def refresh(self):
+        """Send the inventory (re)start sequence; runs on the scheduler thread."""
+        self.last_refresh = time.monotonic()
+        self.refreshes += 1
+        log.debug("Refreshing inventory")
+        for name, data in self.refresh_commands():
+            self._send(Command(name, data))
+
+    def _send(self, command):
+        if callable(command.data):
+            try:
+                command.data()
+            except Exception as e:
+                log.error("Error running %s: %s", command.name, e)
+            command.done.set()
+            return
+
+        if command.wait_ack:
+            with self.ack_lock:
+                self.pending_ack = command
+        start = time.monotonic_ns()
+        try:
+            self.transport.write(command.data)
+            self.commands_sent += 1
+        except Exception as e:
+            log.error("Error sending %s: %s", command.name, e)
+            with self.ack_lock:
+                self.pending_ack = None
+            command.done.set()
+            return
+
+        if not command.wait_ack:
+            command.done.set()
+            return
+        if command.done.wait(self.ack_timeout):
+            self.ack_latency.record(time.monotonic_ns() - start)
+        else:
+            self.ack_timeouts += 1
+            with self.ack_lock:
+                if self.pending_ack is command:
+                    self.pending_ack = None
+            command.done.set()
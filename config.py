@@ -4,16 +4,48 @@
 FLASK_HOST = '0.0.0.0'  # Host for Flask app
 FLASK_PORT = 5000        # Port for Flask app
 FLASK_DEBUG = True       # Debug mode for Flask
+WEB_SERVER = 'threaded'  # 'threaded' (Flask server, a thread per connection) or 'async' (asyncio, see asgi_server.py)
+ASYNC_WORKERS = 8        # Threads running the regular Flask routes in async mode
+FEED_HISTORY = 10000     # /stream messages kept for reconnecting clients; older clients get a snapshot
+MULTIPROCESS = False     # Read the serial port in its own process and build exports in a worker process
+EXPORT_WORKERS = 1       # Export worker processes in multiprocess mode
 
 # Serial Port Configuration
 DEFAULT_SERIAL_PORT = '/dev/tty.usbmodemXXXX'  # Default serial port for macOS
 DEFAULT_BAUD_RATE = 57600                     # Default baud rate
 SERIAL_TIMEOUT = 1                            # Serial connection timeout
+READ_TIMEOUT = 0.1                            # Max time a blocking read waits before the read loop checks in
+READ_CHUNK_SIZE = 4096                        # Max bytes taken from the port per read
+DATA_QUEUE_CHUNKS = 1024                      # Max chunks waiting between the read and processing threads
+DATA_QUEUE_MAX_BYTES = 4 * 1024 * 1024        # Max bytes waiting there (about 200k frames)
+DATA_QUEUE_POLICY = 'drop-oldest'             # When full: 'drop-oldest', 'coalesce' or 'block' (see chunk_buffer.py)
+SHARED_RING_BYTES = 4 * 1024 * 1024           # Shared memory between the ingest process and the reader (multiprocess mode)
+CLOCK_RESYNC_THRESHOLD = 1.0                  # Seconds of wall-clock drift (e.g. after a suspend) before the time base is recalibrated
+INGEST_DELAY_SAMPLES = 100000                 # Most recent frames kept when measuring the ingest-to-decode delay
 
 # CSV Configuration
 DEFAULT_CSV_FILE = 'rfid_data.csv'            # Default CSV file for storing RFID data
+CSV_BATCH_SIZE = 100                          # Rows written per batch by the background CSV writer
+CSV_FLUSH_INTERVAL = 0.5                      # Max seconds a row waits before its batch is written
+CSV_FSYNC_INTERVAL = 2.0                      # Seconds between fsync calls on the CSV file
+
+# Results Configuration
+DEFAULT_JOURNAL_FILE = 'rfid_events.db'       # Append-only Start/Finish event journal (SQLite)
+DEFAULT_READ_JOURNAL_FILE = 'rfid_reads.journal'  # Binary log of every accepted read, replayed after a crash
+READ_JOURNAL_COMMIT_INTERVAL = 0.05           # Seconds between group commits (write + fsync) of the read journal
+EXPORT_DIR = 'exports'                        # Cached downloads (/download_start, _finish, _merged), next to the app
+DEFAULT_GATE = 'Start'                        # Sheet new reads are recorded to (Start or Finish)
 
 # RFID Reader Configuration
+FRAME_LENGTH = 21                             # Size of a Chafon tag frame in bytes
+FRAME_HEADER = 0xA0                           # First byte of every frame
+VERIFY_CHECKSUM = True                        # Drop frames whose trailing checksum byte does not match
+REREAD_WINDOW = 0                             # Seconds of silence after which a tag counts as a new pass (0 = record once)
+PASS_WINDOW = 1.0                             # Seconds of reads per pass searched for the peak-RSSI chip time (0 = first read)
+MAX_RESPONSE_LENGTH = 32                      # Longest command response frame accepted from the reader
+COMMAND_ACK_TIMEOUT = 0.1                     # Max seconds to wait for the reader to answer a command
+INVENTORY_REFRESH_MIN = 3                     # Restart inventory after this many seconds without a tag read
+INVENTORY_REFRESH_MAX = 30                    # Restart inventory at least this often, even while tags are read
 INVENTORY_COMMANDS = [
     bytearray([0xBB, 0x00, 0x22, 0x00, 0x00, 0x22, 0x7E]),  # Standard inventory command
     bytearray([0xA0, 0x04, 0x01, 0xDB, 0x4B]),              # Alternative command
@@ -21,4 +53,9 @@ INVENTORY_COMMANDS = [
 
 # Logging Configuration
 LOG_FILE = 'rfid_reader.log'                  # Log file for debugging
-LOG_LEVEL = 'DEBUG'                           # Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
\ No newline at end of file
+LOG_LEVEL = 'DEBUG'                           # Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+LOG_CONSOLE_LEVEL = 'INFO'                    # Level for console output; the log file uses LOG_LEVEL
+LOG_MAX_BYTES = 10 * 1024 * 1024              # Rotate the log file at this size
+LOG_BACKUP_COUNT = 5                          # Rotated log files to keep
+LOG_RATE_LIMIT = 10.0                         # Seconds before the same warning/error is logged again
+LOG_RAW_PACKETS = False                       # Hex dump every raw chunk and frame at DEBUG level (very verbose)
\ No newline at end of file
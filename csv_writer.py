@@ -0,0 +1,141 @@
+import csv
+import logging
+import os
+import time
+import threading
+from queue import Queue, Empty
+
+import config
+from metrics import LatencyStats
+
+log = logging.getLogger(__name__)
+
+
+class CsvWriter:
+    """Background CSV writer that keeps the file open and writes in batches.
+
+    ``submit`` only enqueues the row, so a slow disk never blocks the
+    caller. Rows are written once ``batch_size`` are pending or the oldest
+    has waited ``flush_interval`` seconds, and the file is fsynced at most
+    every ``fsync_interval`` seconds.
+    """
+
+    def __init__(self, path, fieldnames, batch_size=config.CSV_BATCH_SIZE,
+                 flush_interval=config.CSV_FLUSH_INTERVAL, fsync_interval=config.CSV_FSYNC_INTERVAL):
+        self.path = path
+        self.fieldnames = fieldnames
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.queue = Queue()
+        self.flush_latency = LatencyStats()
+        self.rows_written = 0
+        self.errors = 0
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        """Start the writer thread."""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, row):
+        """Queue a row (dict keyed by fieldnames) for writing."""
+        self.queue.put(row)
+
+    def stop(self, timeout=5):
+        """Write any queued rows, fsync and close the file."""
+        if not self.running:
+            return
+        self.running = False
+        self.queue.put(None)  # Wake the writer
+        self.thread.join(timeout=timeout)
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue.qsize(),
+            'rows_written': self.rows_written,
+            'errors': self.errors,
+            'flush_latency': self.flush_latency.snapshot()
+        }
+
+    def _run(self):
+        csvfile = None
+        try:
+            csvfile = open(self.path, 'a', newline='')
+            writer = csv.DictWriter(csvfile, fieldnames=self.fieldnames, extrasaction='ignore')
+            if csvfile.tell() == 0:
+                writer.writeheader()
+        except Exception as e:
+            log.error("Error opening CSV file %s: %s", self.path, e)
+            self.errors += 1
+            writer = None
+
+        batch = []
+        deadline = None
+        last_fsync = time.monotonic()
+        dirty = False  # Rows written since the last fsync
+        stopping = False
+        while not stopping:
+            timeout = self.flush_interval if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                row = self.queue.get(timeout=timeout)
+                if row is None:
+                    stopping = True
+                else:
+                    batch.append(row)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+            except Empty:
+                pass
+
+            now = time.monotonic()
+            due = batch and (len(batch) >= self.batch_size or now >= deadline)
+            if not (due or stopping):
+                if dirty and now - last_fsync >= self.fsync_interval:
+                    dirty = not self._fsync(csvfile)
+                    last_fsync = now
+                continue
+
+            # Take everything already queued so one flush covers it
+            while not stopping:
+                try:
+                    row = self.queue.get_nowait()
+                except Empty:
+                    break
+                if row is None:
+                    stopping = True
+                else:
+                    batch.append(row)
+
+            if batch and writer:
+                start = time.monotonic_ns()
+                try:
+                    writer.writerows(batch)
+                    csvfile.flush()
+                    self.rows_written += len(batch)
+                    dirty = True
+                    if stopping or now - last_fsync >= self.fsync_interval:
+                        dirty = not self._fsync(csvfile)
+                        last_fsync = now
+                except Exception as e:
+                    log.error("Error saving to CSV: %s", e)
+                    self.errors += 1
+                self.flush_latency.record(time.monotonic_ns() - start)
+            batch = []
+            deadline = None
+
+        if csvfile:
+            csvfile.close()
+
+    def _fsync(self, csvfile):
+        try:
+            os.fsync(csvfile.fileno())
+            return True
+        except Exception as e:
+            log.error("Error syncing CSV file: %s", e)
+            self.errors += 1
+            return False
@@ -0,0 +1,97 @@
+import itertools
+import logging
+import os
+import threading
+
+from exporters import EXPORT_FORMATS
+
+log = logging.getLogger(__name__)
+
+EXPORT_DATASETS = ('start', 'finish', 'merged')
+
+
+class ExportCache:
+    """Downloads built by background jobs and kept until the data changes.
+
+    Each (dataset, format) pair has at most one file, tagged with the
+    reader's ``export_key`` at the moment the build started. ``get``
+    returns that file while the key still matches, so repeated downloads
+    without new reads cost nothing; otherwise it starts a build on the
+    JobRunner, or joins the one already running for that pair so a busy
+    race cannot pile up exports of ever newer versions.
+    """
+
+    def __init__(self, reader, jobs, directory):
+        self.reader = reader
+        self.jobs = jobs
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.files = {}  # (dataset, fmt) -> (key, path)
+        self.building = {}  # (dataset, fmt) -> running Job
+        self.retired = {}  # (dataset, fmt) -> path replaced by the newest build, deleted on the next
+        self.names = itertools.count(1)
+
+    def get(self, dataset, fmt):
+        """Return ``(path, None)`` if the cached file is current, else ``(None, job)`` building it.
+
+        Raises ValueError for an unknown dataset or format, and whatever
+        ``export_key`` raises (e.g. FileNotFoundError without a roster).
+        """
+        if dataset not in EXPORT_DATASETS or fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export {dataset}.{fmt}")
+        key = self.reader.export_key(dataset)
+        with self.lock:
+            cached = self.files.get((dataset, fmt))
+            if cached and cached[0] == key and os.path.exists(cached[1]):
+                return cached[1], None
+            job = self.building.get((dataset, fmt))
+            if job is None or not job.running:
+                job = self.jobs.submit('export', self._build, dataset, fmt)
+                self.building[(dataset, fmt)] = job
+            return None, job
+
+    def latest(self, dataset, fmt):
+        """Path of the newest file built for the pair, current or not; None if there is none."""
+        with self.lock:
+            cached = self.files.get((dataset, fmt))
+        return cached[1] if cached and os.path.exists(cached[1]) else None
+
+    def clear(self):
+        """Forget and delete every cached file."""
+        with self.lock:
+            paths = [path for _, path in self.files.values()] + list(self.retired.values())
+            self.files.clear()
+            self.retired.clear()
+        for path in paths:
+            self._remove(path)
+
+    def _build(self, job, dataset, fmt):
+        job.progress(0, stage='exporting')
+        # Taken before the rows are read, so the file is at least as new as its key
+        key = self.reader.export_key(dataset)
+        os.makedirs(self.directory, exist_ok=True)
+        # A new name per build, so a download still sending an older file is not disturbed
+        path = os.path.join(self.directory, f"{dataset}-{next(self.names)}.{fmt}")
+        try:
+            self.reader.write_export(dataset, fmt, path, job.progress)
+        except BaseException:
+            self._remove(path)
+            raise
+        with self.lock:
+            previous = self.files.get((dataset, fmt))
+            self.files[(dataset, fmt)] = (key, path)
+            # The replaced file survives one more build, for downloads that just looked it up
+            stale = self.retired.pop((dataset, fmt), None)
+            if previous:
+                self.retired[(dataset, fmt)] = previous[1]
+        if stale:
+            self._remove(stale)
+        log.info("Exported %s.%s (%d bytes)", dataset, fmt, os.path.getsize(path))
+        return {'dataset': dataset, 'format': fmt, 'size': os.path.getsize(path)}
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # Already gone, or still open for a download on Windows
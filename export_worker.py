@@ -0,0 +1,65 @@
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+from exporters import export_table, write_export
+from participants import ParticipantIndex, iter_roster, validate_roster
+from result_journal import ResultJournal
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def run(func, *args):
+    """Run ``func(*args)`` in the export worker process and return its result.
+
+    Workbook generation is pure-Python openpyxl work that holds the GIL
+    for seconds on large fields; in its own process it cannot slow down
+    tag decoding. The functions below read the journal and output files
+    themselves, so only file names cross the process boundary.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(config.EXPORT_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        pool = _pool
+    return pool.submit(func, *args).result()
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def export_workbook(journal_file, output_file, participants=None):
+    """ResultJournal.export_xlsx on the journal at ``journal_file``."""
+    journal = ResultJournal(journal_file)
+    try:
+        journal.export_xlsx(output_file, participants)
+    finally:
+        journal.close()
+
+
+def export_dataset(output_file, journal_file, dataset, fmt, path):
+    """Write one downloadable dataset (see exporters.export_table) to ``path``."""
+    participants = None
+    if dataset == 'merged':
+        index = ParticipantIndex()
+        index.load(output_file)
+        participants = index.by_epc
+    journal = ResultJournal(journal_file)
+    try:
+        write_export(path, fmt, *export_table(dataset, journal, participants))
+    finally:
+        journal.close()
+
+
+def import_roster(file_path, journal_file, output_file):
+    """Validate a roster file and write it to ``output_file``; returns the rows."""
+    rows = validate_roster(iter_roster(file_path))
+    export_workbook(journal_file, output_file, rows)
+    return rows
@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+from datetime import timedelta
+
+from openpyxl import Workbook
+
+from participants import BIB_COLUMN, NAME_COLUMN
+
+MERGED_HEADERS = ["EPC", "NAMA", "BIB", "Start Timestamp", "Finish Timestamp", "Duration"]
+GATE_HEADERS = ["EPC", "Timestamp", "Gate"]
+EXPORT_FORMATS = {  # Format -> MIME type of the download
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'json': 'application/json',
+}
+CSV_CHUNK_ROWS = 1000
+NO_RESULT = (None, None, None, None, None)  # journal.results() entry of an EPC without events
+
+
+def format_duration(duration_us):
+    """H:MM:SS[.ffffff] for a duration in microseconds; '' if unknown."""
+    if duration_us is None:
+        return ""
+    return str(timedelta(microseconds=duration_us))
+
+
+def merged_rows(participants, results):
+    """Yield one row per participant in MERGED_HEADERS order.
+
+    ``participants`` maps EPC -> roster row (ParticipantIndex.by_epc) and
+    ``results`` is ``ResultJournal.results()``.
+    """
+    for epc, participant in participants.items():
+        start_time, finish_time, _, _, duration_us = results.get(epc, NO_RESULT)
+        yield [
+            epc,
+            participant[NAME_COLUMN],
+            participant[BIB_COLUMN],
+            start_time or "N/A",
+            finish_time or "N/A",
+            format_duration(duration_us)
+        ]
+
+
+def export_table(dataset, journal, participants=None):
+    """``(headers, rows, sheet_name)`` of a downloadable dataset.
+
+    ``dataset`` is 'merged' (needs ``participants``, EPC -> roster row) or
+    the lower-case name of a gate sheet such as 'start' or 'finish'.
+    ``rows`` is an iterator; nothing is materialised up front.
+    """
+    if dataset == 'merged':
+        return MERGED_HEADERS, merged_rows(participants, journal.results()), "Merged"
+    gate = dataset.capitalize()
+    return GATE_HEADERS, ([epc, timestamp, gate] for epc, timestamp in journal.events(gate)), gate
+
+
+def write_export(path, fmt, headers, rows, sheet_name="Sheet"):
+    """Write ``rows`` to ``path`` as one of EXPORT_FORMATS."""
+    if fmt == 'xlsx':
+        write_xlsx(path, headers, rows, sheet_name)
+    elif fmt == 'csv':
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            f.writelines(iter_csv(headers, rows))
+    elif fmt == 'json':
+        write_json(path, headers, rows)
+    else:
+        raise ValueError(f"Unknown export format {fmt!r}; use one of {', '.join(EXPORT_FORMATS)}")
+
+
+def write_json(path, headers, rows):
+    """Write ``rows`` as a JSON array of objects keyed by ``headers``, one row at a time."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        separator = '\n'
+        for row in rows:
+            f.write(separator)
+            f.write(json.dumps(dict(zip(headers, row)), default=str))
+            separator = ',\n'
+        f.write('\n]\n')
+
+
+def write_xlsx(path, headers, rows, sheet_name="Sheet"):
+    """Write ``rows`` to a single-sheet workbook without holding them in memory.
+
+    Write-only workbooks stream each row to a temporary file, so memory
+    use does not grow with the number of rows.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append(headers)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def iter_csv(headers, rows, chunk_rows=CSV_CHUNK_ROWS):
+    """Yield ``rows`` as CSV text, ``chunk_rows`` rows per chunk, for streaming responses."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    pending = 1
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue()
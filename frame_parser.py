@@ -0,0 +1,128 @@
+import config
+
+# Offsets inside a tag frame:
+#   [0] header  [1] length (bytes after the length field)  [2:6] address/command/status
+#   [6:18] EPC (12 bytes)  [18] RSSI  [19] antenna port  [20] checksum
+EPC_START = 6
+EPC_END = 18
+RSSI_OFFSET = 18
+ANTENNA_OFFSET = 19
+# Smallest command response: header, length, address, command, checksum
+MIN_RESPONSE_LENGTH = 5
+
+
+def frame_checksum(frame):
+    """Checksum of a frame: sum of every byte except the last, modulo 256."""
+    return sum(frame[:-1]) & 0xFF
+
+
+def encode_frame(epc, rssi, antenna, frame_length=config.FRAME_LENGTH, header=config.FRAME_HEADER):
+    """Build a valid tag frame for ``epc`` (12 bytes or a 24 char hex string)."""
+    if isinstance(epc, str):
+        epc = bytes.fromhex(epc)
+    frame = bytearray(frame_length)
+    frame[0] = header
+    frame[1] = frame_length - 2
+    frame[EPC_START:EPC_END] = epc
+    frame[RSSI_OFFSET] = rssi
+    frame[ANTENNA_OFFSET] = antenna
+    frame[-1] = frame_checksum(frame)
+    return bytes(frame)
+
+
+class FrameDecoder:
+    """Incremental decoder that turns a raw byte stream into tag frames.
+
+    Bytes are accumulated in a single buffer and scanned in place. Each
+    frame is yielded as a ``memoryview`` into that buffer, so nothing is
+    copied per frame. A view is only valid until the generator resumes;
+    copy it (``bytes(frame)``) if it has to outlive the loop body.
+
+    On a bad header, length or checksum the decoder jumps straight to the
+    next header byte instead of retrying every offset.
+
+    With ``max_response_length`` set, shorter or longer checksummed frames
+    (command responses from the reader) are yielded as well; callers tell
+    them apart from tag frames by their length.
+    """
+
+    def __init__(self, frame_length=config.FRAME_LENGTH, header=config.FRAME_HEADER,
+                 verify_checksum=config.VERIFY_CHECKSUM, max_response_length=0):
+        self.frame_length = frame_length
+        self.max_response_length = max_response_length
+        self.header = header
+        self.header_byte = bytes([header])
+        self.length_byte = frame_length - 2
+        self.verify_checksum = verify_checksum
+        self.buffer = bytearray()
+        self.pos = 0  # Start of unconsumed data in buffer
+        self.frames = 0
+        self.invalid_frames = 0
+        self.resync_bytes = 0
+
+    def reset(self):
+        """Drop any partially received frame."""
+        self.buffer = bytearray()
+        self.pos = 0
+
+    def pending(self):
+        """Number of buffered bytes not yet consumed."""
+        return len(self.buffer) - self.pos
+
+    def feed(self, data):
+        """Append ``data`` and yield every complete frame now available."""
+        self.buffer += data
+        yield from self._drain()
+
+    def _drain(self):
+        buf = self.buffer
+        end = len(buf)
+        size = self.frame_length
+        header = self.header
+        length_byte = self.length_byte
+        verify = self.verify_checksum
+        max_response = self.max_response_length
+        i = self.pos
+        try:
+            with memoryview(buf) as view:
+                while end - i >= 2:
+                    if buf[i] == header:
+                        if buf[i + 1] == length_byte:
+                            need = size
+                        elif MIN_RESPONSE_LENGTH <= buf[i + 1] + 2 <= max_response:
+                            need = buf[i + 1] + 2
+                        else:
+                            need = 0
+                        if need:
+                            if end - i < need:
+                                break  # Wait for the rest of the frame
+                            frame = view[i:i + need]
+                            if not verify or sum(frame[:-1]) & 0xFF == frame[-1]:
+                                i += need
+                                self.frames += 1
+                                try:
+                                    yield frame
+                                finally:
+                                    frame.release()
+                                continue
+                            frame.release()
+                            self.invalid_frames += 1
+
+                    # Resync on the next header byte
+                    nxt = buf.find(self.header_byte, i + 1)
+                    if nxt < 0:
+                        nxt = end
+                    self.resync_bytes += nxt - i
+                    i = nxt
+        finally:
+            self._compact(i)
+
+    def _compact(self, pos):
+        if pos >= len(self.buffer):
+            self.buffer.clear()
+            pos = 0
+        elif pos > 4096:
+            # Reclaim consumed space once it is large enough to matter
+            del self.buffer[:pos]
+            pos = 0
+        self.pos = pos
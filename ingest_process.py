@@ -0,0 +1,199 @@
+import struct
+import threading
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+
+import config
+from transport import Transport, SerialTransport
+
+RING_HEADER = struct.Struct('<QQQQ')  # Write position, read position, dropped bytes, dropped chunks
+RING_RECORD = struct.Struct('<Iq')  # Data length, arrival time (time.monotonic_ns) in the ingest process
+WRAP = 0xFFFFFFFF  # Record length marking the unused end of the data area
+
+
+class SharedRing:
+    """Single-producer, single-consumer ring of stamped chunks in shared memory.
+
+    Positions only grow; the producer owns the write position and the
+    consumer the read position, so neither needs a lock. A record never
+    straddles the end of the data area: the rest is skipped instead.
+    """
+
+    def __init__(self, name=None, capacity=config.SHARED_RING_BYTES):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=RING_HEADER.size + capacity)
+            RING_HEADER.pack_into(self.shm.buf, 0, 0, 0, 0, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.capacity = self.shm.size - RING_HEADER.size  # The OS may round the size up
+        self.buf = self.shm.buf
+
+    def _positions(self):
+        return RING_HEADER.unpack_from(self.buf, 0)
+
+    def _space_at(self, pos, size):
+        """Bytes to skip at ``pos`` so a record of ``size`` fits without wrapping."""
+        offset = pos % self.capacity
+        return 0 if offset + size <= self.capacity else self.capacity - offset
+
+    def put(self, arrival_ns, data):
+        """Append one chunk (producer side). Returns False if the ring is full."""
+        write_pos, read_pos, dropped_bytes, dropped_chunks = self._positions()
+        size = RING_RECORD.size + len(data)
+        skip = self._space_at(write_pos, size)
+        if size > self.capacity or write_pos + skip + size - read_pos > self.capacity:
+            # Only the producer's own fields are written; the read position belongs to the consumer
+            struct.pack_into('<QQ', self.buf, 16, dropped_bytes + len(data), dropped_chunks + 1)
+            return False
+        if skip >= RING_RECORD.size:
+            RING_RECORD.pack_into(self.buf, RING_HEADER.size + write_pos % self.capacity, WRAP, 0)
+        offset = RING_HEADER.size + (write_pos + skip) % self.capacity
+        RING_RECORD.pack_into(self.buf, offset, len(data), arrival_ns)
+        self.buf[offset + RING_RECORD.size:offset + size] = data
+        # Publish the record only after its bytes are in place
+        struct.pack_into('<Q', self.buf, 0, write_pos + skip + size)
+        return True
+
+    def get(self):
+        """Take the oldest chunk as ``(arrival_ns, data)`` (consumer side), or None if empty."""
+        write_pos, read_pos = struct.unpack_from('<QQ', self.buf, 0)
+        while read_pos < write_pos:
+            offset = read_pos % self.capacity
+            if self.capacity - offset < RING_RECORD.size:
+                read_pos += self.capacity - offset  # Too short for a header: implicitly skipped
+                continue
+            length, arrival_ns = RING_RECORD.unpack_from(self.buf, RING_HEADER.size + offset)
+            if length == WRAP:
+                read_pos += self.capacity - offset
+                continue
+            start = RING_HEADER.size + offset + RING_RECORD.size
+            data = bytes(self.buf[start:start + length])
+            struct.pack_into('<Q', self.buf, 8, read_pos + RING_RECORD.size + length)
+            return arrival_ns, data
+        struct.pack_into('<Q', self.buf, 8, read_pos)
+        return None
+
+    def discard(self):
+        """Drop everything queued (consumer side)."""
+        struct.pack_into('<Q', self.buf, 8, struct.unpack_from('<Q', self.buf, 0)[0])
+
+    def dropped(self):
+        """``(bytes, chunks)`` the producer dropped because the ring was full."""
+        return self._positions()[2:]
+
+    def close(self, unlink=False):
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def ingest_main(port, baud_rate, ring_name, data_ready, stop_event, commands, status):
+    """Entry point of the ingest process: serial port -> shared ring.
+
+    Runs nothing but the blocking serial read and the stamping, so no
+    export or web request in the main process can delay it. Commands
+    from the main process are written to the port by a second thread.
+    """
+    try:
+        transport = SerialTransport(port, baud_rate, read_timeout=config.READ_TIMEOUT)
+    except Exception as e:
+        status.send(('error', str(e)))
+        return
+    ring = SharedRing(ring_name)
+    status.send(('ok', None))
+
+    def write_commands():
+        while not stop_event.is_set():
+            try:
+                data = commands.recv_bytes()
+            except (EOFError, OSError):
+                return
+            transport.write(data)
+
+    threading.Thread(target=write_commands, daemon=True).start()
+    try:
+        while not stop_event.is_set():
+            data = transport.read(config.READ_CHUNK_SIZE, timeout=config.READ_TIMEOUT)
+            if data:
+                ring.put(time.monotonic_ns(), data)
+                data_ready.set()
+    finally:
+        transport.close()
+        ring.close()
+
+
+class SharedMemoryTransport(Transport):
+    """Transport whose serial port is read by a separate ingest process.
+
+    The child process stamps every chunk with ``time.monotonic_ns()`` (the
+    same clock in every process) as its read returns and puts it in a
+    SharedRing; ``read`` here takes chunks from the ring and exposes that
+    stamp as ``arrival_ns``. Writes are passed to the child over a pipe.
+    """
+
+    def __init__(self, port, baud_rate=57600, capacity=config.SHARED_RING_BYTES):
+        context = multiprocessing.get_context('spawn')  # Same behaviour on every platform and in frozen apps
+        self.ring = SharedRing(capacity=capacity)
+        self.data_ready = context.Event()
+        self.stop_event = context.Event()
+        commands_in, self.commands = context.Pipe(duplex=False)
+        status_in, status_out = context.Pipe(duplex=False)
+        self.process = context.Process(
+            target=ingest_main, name='rfid-ingest', daemon=True,
+            args=(port, baud_rate, self.ring.name, self.data_ready, self.stop_event, commands_in, status_out))
+        self.process.start()
+        self.pending = b''  # Rest of a chunk longer than the caller's max_bytes
+        self.discard_requested = False  # Set by reset_input_buffer, carried out by the reading thread
+        self.arrival_ns = None
+        if not status_in.poll(config.SERIAL_TIMEOUT + 10):  # Allow for the child's interpreter start-up
+            self.close()
+            raise OSError(f"Ingest process for {port} did not start")
+        result, message = status_in.recv()
+        if result != 'ok':
+            self.close()
+            raise OSError(message)
+        self.is_open = True
+
+    def read(self, max_bytes=4096, timeout=None):
+        if self.discard_requested:
+            self.discard_requested = False
+            self.pending = b''
+            self.ring.discard()
+        if not self.pending:
+            chunk = self.ring.get()
+            if chunk is None and timeout != 0:
+                # Clear before the second look, so a chunk published in between still wakes us
+                self.data_ready.clear()
+                chunk = self.ring.get()
+                if chunk is None and self.data_ready.wait(timeout):
+                    chunk = self.ring.get()
+            if chunk is None:
+                return b''
+            self.arrival_ns, self.pending = chunk
+        data, self.pending = self.pending[:max_bytes], self.pending[max_bytes:]
+        return data
+
+    def write(self, data):
+        self.commands.send_bytes(bytes(data))
+        return len(data)
+
+    def reset_input_buffer(self):
+        # Called from the command thread: only the reader may move the ring's
+        # read position, so the next read() discards what is queued
+        self.discard_requested = True
+
+    def dropped(self):
+        return self.ring.dropped()
+
+    def close(self):
+        self.is_open = False
+        self.stop_event.set()
+        self.commands.close()  # Ends the child's command thread
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.terminate()
+        if self.ring.buf is not None:
+            self.ring.close(unlink=True)
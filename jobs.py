@@ -0,0 +1,97 @@
+import itertools
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class Job:
+    """State and progress of one background task, polled by the UI."""
+
+    def __init__(self, job_id, kind):
+        self.id = job_id
+        self.kind = kind
+        self.state = 'running'  # 'running', 'done' or 'failed'
+        self.stage = None
+        self.done = 0
+        self.total = None  # None while unknown
+        self.message = None
+        self.errors = []
+        self.result = None
+        self.started = time.time()
+        self.finished = None
+
+    @property
+    def running(self):
+        return self.state == 'running'
+
+    def progress(self, done, total=None, stage=None):
+        """Report ``done`` of ``total`` units; called from the job's thread."""
+        self.done = done
+        if total is not None:
+            self.total = total
+        if stage is not None:
+            self.stage = stage
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'state': self.state,
+            'stage': self.stage,
+            'done': self.done,
+            'total': self.total,
+            'percent': round(100 * min(self.done / self.total, 1), 1) if self.total else None,
+            'message': self.message,
+            'errors': self.errors,
+            'result': self.result,
+            'elapsed': round((self.finished or time.time()) - self.started, 3)
+        }
+
+
+class JobRunner:
+    """Runs long tasks on their own threads so HTTP requests return at once.
+
+    ``submit`` starts ``func(job, *args)``; its return value becomes
+    ``job.result`` and an exception marks the job failed. Only the last
+    ``keep`` finished jobs are remembered.
+    """
+
+    def __init__(self, keep=20):
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.jobs = {}  # id -> Job, in submission order
+        self.ids = itertools.count(1)
+
+    def submit(self, kind, func, *args):
+        with self.lock:
+            job = Job(str(next(self.ids)), kind)
+            self.jobs[job.id] = job
+            self._prune()
+        threading.Thread(target=self._run, args=(job, func, args), daemon=True).start()
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def active(self, kind):
+        """The running job of ``kind``, if any."""
+        with self.lock:
+            return next((job for job in self.jobs.values() if job.kind == kind and job.running), None)
+
+    def _run(self, job, func, args):
+        try:
+            job.result = func(job, *args)
+            job.state = 'done'
+        except Exception as e:
+            job.message = job.message or str(e)
+            job.state = 'failed'
+            log.warning("%s job %s failed: %s", job.kind, job.id, e)
+        finally:
+            job.finished = time.time()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if not job.running]
+        for job_id in finished[:-self.keep or None]:
+            del self.jobs[job_id]
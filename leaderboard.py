@@ -0,0 +1,192 @@
+import threading
+from bisect import bisect_left, insort
+
+from exporters import format_duration
+from participants import BIB_COLUMN, NAME_COLUMN, GENDER_COLUMN, STATUS_COLUMN
+
+OVERALL = 'overall'
+
+
+class Finisher:
+    """Start/finish times of one EPC and the participant details it is ranked by."""
+
+    __slots__ = ('epc', 'start_us', 'finish_us', 'bib', 'name', 'gender', 'category')
+
+    def __init__(self, epc):
+        self.epc = epc
+        self.start_us = None
+        self.finish_us = None
+        self.bib = None
+        self.name = None
+        self.gender = None
+        self.category = None
+
+    @property
+    def duration_us(self):
+        if self.start_us is None or self.finish_us is None:
+            return None
+        return self.finish_us - self.start_us
+
+    def views(self):
+        """Ranking lists this finisher belongs to."""
+        views = [OVERALL]
+        if self.gender is not None:
+            views.append(('gender', self.gender))
+        if self.category is not None:
+            views.append(('category', self.category))
+        return views
+
+
+class Leaderboard:
+    """Live ranking by duration, overall and per gender and category.
+
+    Each view is a list of ``(duration_us, epc)`` kept sorted with bisect,
+    so a Start or Finish event re-ranks one runner with a binary search
+    per view instead of re-sorting the field. The search is O(log n), but
+    inserting into or deleting from the list shifts the entries after it,
+    so an update is O(n): one memmove of pointers, about 4 us per view at
+    10k finishers and 20 us at 100k. That is cheaper in practice than an
+    O(log n) tree or skip list in pure Python at race sizes, and it keeps
+    rank lookups and page slices trivial. Gender and category come
+    from the Participants sheet (Gender and Status columns); the views are
+    rebuilt when the roster changes.
+    """
+
+    def __init__(self, participants, start_gate="Start", finish_gate="Finish"):
+        self.participants = participants
+        self.start_gate = start_gate
+        self.finish_gate = finish_gate
+        self.lock = threading.Lock()
+        self.finishers = {}  # epc -> Finisher, with or without a duration yet
+        self.views = {OVERALL: []}
+        self.participants_version = None
+        self.loaded = False  # False until rebuilt from the journal
+
+    def rebuild(self, results):
+        """Replace the contents with ``journal.results()``."""
+        with self.lock:
+            self.finishers = {}
+            for epc, (_, _, start_us, finish_us, _) in results.items():
+                finisher = Finisher(epc)
+                finisher.start_us = start_us
+                finisher.finish_us = finish_us
+                self.finishers[epc] = finisher
+            self._reindex()
+            self.loaded = True
+
+    def invalidate(self):
+        """Force a rebuild from the journal, e.g. after events were deleted."""
+        self.loaded = False
+
+    def record(self, gate, epc, ts_us):
+        """Apply a Start or Finish event. Returns the runner's standings if it is ranked."""
+        if gate not in (self.start_gate, self.finish_gate) or ts_us is None or not self.loaded:
+            return None
+        with self.lock:
+            self._check_roster()
+            finisher = self.finishers.get(epc)
+            if finisher is None:
+                finisher = self.finishers[epc] = Finisher(epc)
+                self._describe(finisher)
+            self._unrank(finisher)
+            if gate == self.start_gate:
+                finisher.start_us = ts_us
+            else:
+                finisher.finish_us = ts_us
+            if self._rank(finisher):
+                return self._standing(finisher)
+        return None
+
+    def page(self, gender=None, category=None, page=1, per_page=50):
+        """One page of a view as ``(rows, total)``; ranks start at 1."""
+        with self.lock:
+            self._check_roster()
+            if gender is not None:
+                view = self.views.get(('gender', gender), [])
+            elif category is not None:
+                view = self.views.get(('category', category), [])
+            else:
+                view = self.views[OVERALL]
+            offset = (page - 1) * per_page
+            rows = []
+            for position, (_, epc) in enumerate(view[offset:offset + per_page], offset + 1):
+                row = self._standing(self.finishers[epc])
+                row['rank'] = position
+                rows.append(row)
+            return rows, len(view)
+
+    def groups(self):
+        """Genders and categories that have ranked runners, with their counts."""
+        with self.lock:
+            result = {'gender': {}, 'category': {}}
+            for view, entries in self.views.items():
+                if view != OVERALL and entries:
+                    result[view[0]][str(view[1])] = len(entries)
+            return result
+
+    def _check_roster(self):
+        if self.participants.version != self.participants_version:
+            self._reindex()
+
+    def _reindex(self):
+        """Re-read participant details and rebuild every view."""
+        self.participants_version = self.participants.version
+        self.views = {OVERALL: []}
+        for finisher in self.finishers.values():
+            self._describe(finisher)
+            duration = finisher.duration_us
+            if duration is not None:
+                for view in finisher.views():
+                    self.views.setdefault(view, []).append((duration, finisher.epc))
+        for entries in self.views.values():
+            entries.sort()
+
+    def _describe(self, finisher):
+        participant = self.participants.find_epc(finisher.epc)
+        if participant:
+            finisher.bib = participant[BIB_COLUMN]
+            finisher.name = participant[NAME_COLUMN]
+            finisher.gender = participant[GENDER_COLUMN]
+            finisher.category = participant[STATUS_COLUMN]
+
+    def _rank(self, finisher):
+        duration = finisher.duration_us
+        if duration is None:
+            return False
+        key = (duration, finisher.epc)
+        for view in finisher.views():
+            insort(self.views.setdefault(view, []), key)
+        return True
+
+    def _unrank(self, finisher):
+        duration = finisher.duration_us
+        if duration is None:
+            return
+        key = (duration, finisher.epc)
+        for view in finisher.views():
+            entries = self.views.get(view)
+            if entries:
+                index = bisect_left(entries, key)
+                if index < len(entries) and entries[index] == key:
+                    del entries[index]
+
+    def _position(self, view, finisher):
+        entries = self.views.get(view)
+        if not entries:
+            return None
+        return bisect_left(entries, (finisher.duration_us, finisher.epc)) + 1
+
+    def _standing(self, finisher):
+        """JSON-friendly row with the runner's rank in each of its views."""
+        return {
+            'epc': finisher.epc,
+            'bib': finisher.bib,
+            'name': finisher.name,
+            'gender': finisher.gender,
+            'category': finisher.category,
+            'duration_us': finisher.duration_us,
+            'duration': format_duration(finisher.duration_us),
+            'overall_rank': self._position(OVERALL, finisher),
+            'gender_rank': self._position(('gender', finisher.gender), finisher) if finisher.gender is not None else None,
+            'category_rank': self._position(('category', finisher.category), finisher) if finisher.category is not None else None
+        }
@@ -0,0 +1,165 @@
+import json
+import logging
+import logging.handlers
+import threading
+from queue import SimpleQueue
+
+import config
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def fields(record):
+    """The structured fields passed to a log call through ``extra``."""
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any extra fields."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        entry.update(fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """Human-readable line with the extra fields appended as key=value."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        extra = fields(record)
+        if extra:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in extra.items())
+        return line
+
+
+class RateLimitFilter(logging.Filter):
+    """Drops repeats of a warning or error from the same call site within ``interval`` seconds.
+
+    The first record after the window carries a ``suppressed`` field with
+    the number of records dropped in between.
+    """
+
+    def __init__(self, interval=config.LOG_RATE_LIMIT, level=logging.WARNING):
+        super().__init__()
+        self.interval = interval
+        self.level = level
+        self.lock = threading.Lock()
+        self.windows = {}  # (logger, file, line) -> [window start, records dropped]
+
+    def filter(self, record):
+        if record.levelno < self.level or self.interval <= 0:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        with self.lock:
+            window = self.windows.get(key)
+            if window and record.created - window[0] < self.interval:
+                window[1] += 1
+                return False
+            self.windows[key] = [record.created, 0]
+        if window and window[1]:
+            record.suppressed = window[1]
+        return True
+
+
+class HexDump:
+    """Formats bytes as an offset/hex/ASCII dump, only if the record is emitted.
+
+    Safe for any binary data; non-printable bytes show as '.' in the
+    ASCII column. The bytes are copied up front: the record is formatted
+    later on the listener thread, by which time a memoryview or buffer
+    passed in may have been released or overwritten.
+    """
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = bytes(data)
+
+    def __str__(self):
+        data = self.data
+        lines = []
+        for offset in range(0, len(data), 16):
+            row = data[offset:offset + 16]
+            text = ''.join(chr(b) if 32 <= b < 127 else '.' for b in row)
+            lines.append(f"{offset:08X}  {row.hex(' ').upper():<47}  |{text}|")
+        return f"{len(data)} bytes\n" + '\n'.join(lines)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that enqueues records unformatted.
+
+    The stock ``prepare`` formats the message and traceback on the calling
+    thread and drops ``exc_info``. The listener runs in this process, so
+    nothing has to be pickled: the record goes on the queue as it is, and
+    the handlers format it (tracebacks included) on the listener thread.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(log_file=config.LOG_FILE, level=config.LOG_LEVEL, console_level=config.LOG_CONSOLE_LEVEL):
+    """Route all logging through a queue to a rotating JSON file and the console.
+
+    Callers only pay for putting the record on the queue; a listener
+    thread does the formatting and I/O, so a slow console or disk never
+    blocks the reader threads. Safe to call more than once.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener:
+            return _listener
+        handlers = []
+        console = logging.StreamHandler()
+        console.setLevel(console_level)
+        console.setFormatter(ConsoleFormatter())
+        handlers.append(console)
+        if log_file:
+            try:
+                file_handler = logging.handlers.RotatingFileHandler(
+                    log_file, maxBytes=config.LOG_MAX_BYTES, backupCount=config.LOG_BACKUP_COUNT,
+                    encoding='utf-8')
+                file_handler.setLevel(level)
+                file_handler.setFormatter(JsonFormatter())
+                handlers.append(file_handler)
+            except OSError as e:
+                logging.getLogger(__name__).warning("Cannot open log file %s: %s", log_file, e)
+
+        queue_handler = DeferredQueueHandler(SimpleQueue())
+        queue_handler.addFilter(RateLimitFilter())
+        root = logging.getLogger()
+        root.addHandler(queue_handler)
+        root.setLevel(min(logging.getLevelName(level), logging.getLevelName(console_level)))
+        logging.getLogger('rfid_reader.raw').setLevel(logging.DEBUG if config.LOG_RAW_PACKETS else logging.INFO)
+
+        _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        return _listener
+
+
+def shutdown_logging():
+    """Write out queued records and stop the listener thread."""
+    global _listener
+    with _setup_lock:
+        if _listener:
+            _listener.stop()
+            _listener = None
@@ -0,0 +1,145 @@
+import threading
+from array import array
+from bisect import bisect_left
+
+# Histogram bucket upper bounds in seconds, from 50 us to 1 s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+_BUCKETS_NS = tuple(int(bound * 1e9) for bound in LATENCY_BUCKETS)
+
+
+class LatencyStats:
+    """Running latency statistics (count, mean, max, last) in milliseconds.
+
+    Samples are also counted in ``LATENCY_BUCKETS`` so they can be
+    exported as a Prometheus histogram; recording stays O(log buckets).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget all recorded samples."""
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.last_ns = 0
+        self.buckets = [0] * (len(_BUCKETS_NS) + 1)  # Last slot counts samples above 1 s
+
+    def record(self, latency_ns):
+        """Record a single latency sample given in nanoseconds."""
+        index = bisect_left(_BUCKETS_NS, latency_ns)
+        with self.lock:
+            self.count += 1
+            self.total_ns += latency_ns
+            self.last_ns = latency_ns
+            self.buckets[index] += 1
+            if latency_ns > self.max_ns:
+                self.max_ns = latency_ns
+
+    def snapshot(self):
+        """Return the current statistics as a JSON-friendly dict."""
+        with self.lock:
+            return {
+                'count': self.count,
+                'avg_ms': round(self.total_ns / self.count / 1e6, 3) if self.count else 0.0,
+                'max_ms': round(self.max_ns / 1e6, 3),
+                'last_ms': round(self.last_ns / 1e6, 3)
+            }
+
+    def histogram(self):
+        """Return ``(cumulative bucket counts, count, sum in seconds)``."""
+        with self.lock:
+            buckets = list(self.buckets)
+            count, total_ns = self.count, self.total_ns
+        cumulative = []
+        running = 0
+        for value in buckets:
+            running += value
+            cumulative.append(running)
+        return cumulative, count, total_ns / 1e9
+
+
+class DelaySampler:
+    """Keeps the last ``capacity`` delay samples for an exact distribution.
+
+    Meant for measurement runs rather than always-on use: ``record`` is an
+    array store, percentiles are computed by sorting a copy in ``summary``.
+    """
+
+    PERCENTILES = (50, 90, 99, 99.9)
+
+    def __init__(self, capacity):
+        self.samples = array('q', bytes(8 * capacity))
+        self.capacity = capacity
+        self.count = 0
+
+    def record(self, delay_ns):
+        self.samples[self.count % self.capacity] = delay_ns
+        self.count += 1
+
+    def summary(self):
+        """Count plus min, percentiles and max in milliseconds over the kept samples."""
+        kept = min(self.count, self.capacity)
+        if not kept:
+            return {'count': 0}
+        ordered = sorted(self.samples[:kept])
+        result = {'count': self.count, 'min_ms': round(ordered[0] / 1e6, 3)}
+        for pct in self.PERCENTILES:
+            result[f'p{pct:g}_ms'] = round(ordered[min(kept - 1, int(kept * pct / 100))] / 1e6, 3)
+        result['max_ms'] = round(ordered[-1] / 1e6, 3)
+        return result
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+class PrometheusText:
+    """Collects samples and renders them in the Prometheus text exposition format.
+
+    Metrics are gathered at scrape time from counters the pipeline keeps
+    anyway, so instrumentation costs nothing between scrapes.
+    """
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self.families = {}  # name -> (type, help, sample lines), in insertion order
+
+    def _lines(self, name, kind, help_text):
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = (kind, help_text, [])
+        return family[2]
+
+    def counter(self, name, help_text, value, **labels):
+        self._lines(name, 'counter', help_text).append(f"{name}{_format_labels(labels)} {value}")
+
+    def gauge(self, name, help_text, value, **labels):
+        self._lines(name, 'gauge', help_text).append(f"{name}{_format_labels(labels)} {value}")
+
+    def histogram(self, name, help_text, stats, **labels):
+        """Add a LatencyStats as a histogram in seconds."""
+        lines = self._lines(name, 'histogram', help_text)
+        cumulative, count, total = stats.histogram()
+        bounds = [repr(bound) for bound in LATENCY_BUCKETS] + ['+Inf']
+        for bound, value in zip(bounds, cumulative):
+            lines.append(f"{name}_bucket{_format_labels(dict(labels, le=bound))} {value}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+    def render(self):
+        out = []
+        for name, (kind, help_text, lines) in self.families.items():
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return '\n'.join(out) + '\n'
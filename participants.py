@@ -0,0 +1,202 @@
+import os
+import csv
+import string
+import threading
+
+from openpyxl import load_workbook
+
+PARTICIPANT_HEADERS = ["Member NO", "Nama", "Alamat", "Gender", "EPC", "Country", "Status"]
+BIB_COLUMN = 0
+NAME_COLUMN = 1
+GENDER_COLUMN = 3
+EPC_COLUMN = 4
+STATUS_COLUMN = 6  # Race category
+EPC_HEX_LENGTH = 24  # 96-bit EPCs, as reported in reader frames
+MAX_REPORTED_ERRORS = 100
+
+
+def normalize_epc(epc):
+    """EPCs are compared as upper-case hex strings without surrounding whitespace."""
+    return str(epc).strip().upper() if epc is not None else None
+
+
+class RosterError(ValueError):
+    """A roster file failed validation; ``errors`` lists ``(row number, message)``."""
+
+    def __init__(self, errors, error_count):
+        super().__init__(f"{error_count} invalid rows in roster")
+        self.errors = errors
+        self.error_count = error_count
+
+    def __reduce__(self):
+        # Raised in the export worker process in multiprocess mode
+        return RosterError, (self.errors, self.error_count)
+
+
+def roster_size(path):
+    """Estimated number of data rows in an xlsx or CSV roster, or None if unknown."""
+    if path.lower().endswith('.csv'):
+        with open(path, 'rb') as f:
+            return max(sum(chunk.count(b'\n') for chunk in iter(lambda: f.read(1 << 20), b'')) - 1, 0)
+    workbook = load_workbook(path, read_only=True)
+    try:
+        rows = workbook.active.max_row
+    finally:
+        workbook.close()
+    return rows - 1 if rows else None
+
+
+def iter_roster(path):
+    """Yield the data rows of an xlsx (first sheet) or CSV roster, skipping the header.
+
+    Workbooks are opened read-only and CSV files are read line by line,
+    so memory use does not grow with the size of the roster.
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            try:
+                dialect = csv.Sniffer().sniff(f.read(4096), delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+            f.seek(0)
+            rows = csv.reader(f, dialect)
+            next(rows, None)
+            for row in rows:
+                yield [value.strip() or None for value in row]
+        return
+    workbook = load_workbook(path, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(min_row=2, values_only=True)
+        yield from rows
+    finally:
+        workbook.close()
+
+
+def validate_roster(rows, progress=None, progress_every=1000):
+    """Check and normalize roster rows in one pass. Returns the rows as tuples.
+
+    Blank rows are skipped. Every EPC must be EPC_HEX_LENGTH hex digits
+    and unique, and every BIB unique; on any error RosterError is raised
+    with the first MAX_REPORTED_ERRORS problems by row number.
+    ``progress(rows_read)`` is called every ``progress_every`` rows.
+    """
+    width = len(PARTICIPANT_HEADERS)
+    hex_digits = set(string.hexdigits.upper())
+    valid = []
+    epc_rows = {}
+    bib_rows = {}
+    errors = []
+    error_count = 0
+    line = 1
+    for line, row in enumerate(rows, 2):  # Row 1 is the header
+        if progress and line % progress_every == 0:
+            progress(line - 1)
+        row = tuple(row[:width]) + (None,) * (width - len(row))
+        if all(value is None for value in row):
+            continue
+        problems = []
+        epc = normalize_epc(row[EPC_COLUMN])
+        if not epc:
+            problems.append("missing EPC")
+        elif len(epc) != EPC_HEX_LENGTH or not hex_digits.issuperset(epc):
+            problems.append(f"invalid EPC {epc!r}")
+        elif epc in epc_rows:
+            problems.append(f"duplicate EPC {epc} (row {epc_rows[epc]})")
+        else:
+            epc_rows[epc] = line
+        bib = row[BIB_COLUMN]
+        if bib is not None:
+            if isinstance(bib, float) and bib.is_integer():
+                bib = int(bib)
+            if str(bib) in bib_rows:
+                problems.append(f"duplicate BIB {bib} (row {bib_rows[str(bib)]})")
+            else:
+                bib_rows[str(bib)] = line
+        if problems:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append((line, '; '.join(problems)))
+            continue
+        row = list(row)
+        row[BIB_COLUMN] = bib
+        row[EPC_COLUMN] = epc
+        valid.append(tuple(row))
+    if progress:
+        progress(line - 1)
+    if error_count:
+        raise RosterError(errors, error_count)
+    return valid
+
+
+class ParticipantIndex:
+    """In-memory copy of the Participants sheet, indexed by EPC and BIB.
+
+    ``load`` only re-reads the workbook when it is a different file or
+    its modification time changed; lookups never touch the disk.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.path = None
+        self.mtime = None
+        self.rows = []  # One tuple per participant, in PARTICIPANT_HEADERS order
+        self.by_epc = {}
+        self.by_bib = {}
+        self.records = []  # rows as dicts, built once for the JSON API
+        self.version = 0  # Incremented whenever the rows are replaced
+
+    def load(self, path):
+        """Bring the index up to date with ``path``. Returns True if it was re-read.
+
+        Raises FileNotFoundError if the file is missing and KeyError if it
+        has no Participants sheet.
+        """
+        mtime = os.path.getmtime(path)
+        if path == self.path and mtime == self.mtime:
+            return False
+
+        workbook = load_workbook(path, read_only=True)
+        try:
+            if "Participants" not in workbook.sheetnames:
+                raise KeyError("Participants sheet does not exist")
+            rows = list(workbook["Participants"].iter_rows(min_row=2, values_only=True))
+        finally:
+            workbook.close()
+        self.set_rows(rows, path, mtime)
+        return True
+
+    def set_rows(self, rows, path=None, mtime=None):
+        """Replace the index contents, e.g. right after an import."""
+        width = len(PARTICIPANT_HEADERS)
+        rows = [tuple(row[:width]) + (None,) * (width - len(row)) for row in rows]
+        by_epc = {}
+        by_bib = {}
+        for row in rows:
+            if row[EPC_COLUMN] is not None:
+                by_epc[normalize_epc(row[EPC_COLUMN])] = row
+            if row[BIB_COLUMN] is not None:
+                by_bib[str(row[BIB_COLUMN])] = row
+        records = [dict(zip(PARTICIPANT_HEADERS, row)) for row in rows]
+        with self.lock:
+            self.rows = rows
+            self.by_epc = by_epc
+            self.by_bib = by_bib
+            self.records = records
+            self.path = path
+            self.mtime = mtime
+            self.version += 1
+
+    def mark_current(self, path):
+        """Accept the current mtime of ``path`` after we rewrote it without touching participants."""
+        if path == self.path and os.path.exists(path):
+            self.mtime = os.path.getmtime(path)
+
+    def invalidate(self):
+        """Force the next ``load`` to re-read the file."""
+        self.mtime = None
+
+    def find_epc(self, epc):
+        return self.by_epc.get(normalize_epc(epc))
+
+    def find_bib(self, bib):
+        return self.by_bib.get(str(bib))
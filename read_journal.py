@@ -0,0 +1,173 @@
+import os
+import time
+import logging
+import struct
+import threading
+import zlib
+from collections import deque
+
+import config
+from metrics import LatencyStats
+
+JOURNAL_MAGIC = b'RFIDRJ01'
+BLOCK_HEADER = struct.Struct('<II')  # Payload length, CRC-32 of the payload
+READ_RECORD = struct.Struct('<12sqBB')  # EPC, epoch ns, RSSI, antenna; a block payload is a run of these
+
+log = logging.getLogger(__name__)
+
+
+class ReadJournal:
+    """Append-only binary log of every accepted tag read, for crash recovery.
+
+    ``append`` only puts a tuple on a deque; a writer thread packs
+    everything queued into one block and writes it with one fsync per
+    ``commit_interval`` (group commit), so at most that much is lost in a
+    crash. Each block is length-prefixed and checksummed (CRC-32): a block
+    torn by a crash or power loss is detected and cut off on recovery, and
+    valid blocks are unpacked by ``struct.iter_unpack`` without a Python
+    loop per byte range.
+    """
+
+    def __init__(self, path, commit_interval=config.READ_JOURNAL_COMMIT_INTERVAL):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.pending = deque()  # (epc, time_ns, rssi, antenna); append/popleft are thread-safe
+        self.file = None
+        self.file_lock = threading.Lock()  # Held while writing or truncating
+        self.thread = None
+        self.running = False
+        self.wake = threading.Event()
+        self.records_written = 0
+        self.commits = 0
+        self.errors = 0
+        self.commit_latency = LatencyStats()
+        self.recovered = 0
+        self.truncated_bytes = 0  # Torn or corrupt tail cut off by the last recovery
+
+    def recover(self):
+        """Return the valid reads in the journal, in order, as a list of tuples.
+
+        Stops at the first block that is incomplete or fails its checksum
+        and truncates the file there, so new blocks follow a valid one.
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        if not data.startswith(JOURNAL_MAGIC):
+            self.truncated_bytes = len(data)
+            self._truncate(0)
+            return []
+
+        reads = []
+        view = memoryview(data)
+        crc32 = zlib.crc32
+        header_size = BLOCK_HEADER.size
+        size = len(data)
+        pos = len(JOURNAL_MAGIC)
+        while pos + header_size <= size:
+            length, crc = BLOCK_HEADER.unpack_from(data, pos)
+            start = pos + header_size
+            end = start + length
+            if end > size or length % READ_RECORD.size or crc32(view[start:end]) != crc:
+                break
+            reads.extend(READ_RECORD.iter_unpack(view[start:end]))
+            pos = end
+        view.release()
+        if pos < size:
+            self.truncated_bytes = size - pos
+            self._truncate(pos)
+        self.recovered = len(reads)
+        return reads
+
+    def _truncate(self, size):
+        with open(self.path, 'r+b') as f:
+            f.truncate(size)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def start(self):
+        """Open the journal for appending and start the writer thread."""
+        if self.running:
+            return
+        self.file = open(self.path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(JOURNAL_MAGIC)
+            self.file.flush()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def append(self, epc, time_ns, rssi, antenna):
+        self.pending.append((epc, time_ns, rssi, antenna))
+
+    def stop(self, timeout=5):
+        """Commit everything queued and close the file."""
+        if not self.running:
+            return
+        self.running = False
+        self.wake.set()
+        self.thread.join(timeout=timeout)
+        with self.file_lock:
+            self.file.close()
+            self.file = None
+
+    def reset(self):
+        """Drop all records (e.g. when the race data is cleared)."""
+        with self.file_lock:
+            self.pending.clear()
+            if self.file:
+                self.file.truncate(len(JOURNAL_MAGIC))
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            elif os.path.exists(self.path):
+                self._truncate(0)
+
+    def stats(self):
+        return {
+            'pending': len(self.pending),
+            'records_written': self.records_written,
+            'commits': self.commits,
+            'errors': self.errors,
+            'recovered': self.recovered,
+            'truncated_bytes': self.truncated_bytes,
+            'commit_latency': self.commit_latency.snapshot()
+        }
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.commit_interval)
+            self.wake.clear()
+            stopping = not self.running
+            self._commit()
+            if stopping:
+                return
+
+    def _commit(self):
+        if not self.pending:
+            return
+        start = time.monotonic_ns()
+        pack_into = READ_RECORD.pack_into
+        record_size = READ_RECORD.size
+        with self.file_lock:  # reset() must not run between taking reads and writing them
+            popleft = self.pending.popleft
+            count = len(self.pending)
+            block = bytearray(BLOCK_HEADER.size + count * record_size)
+            offset = BLOCK_HEADER.size
+            for _ in range(count):
+                pack_into(block, offset, *popleft())
+                offset += record_size
+            payload = memoryview(block)[BLOCK_HEADER.size:]
+            BLOCK_HEADER.pack_into(block, 0, len(payload), zlib.crc32(payload))
+            payload.release()
+            try:
+                self.file.write(block)
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.records_written += count
+                self.commits += 1
+            except Exception as e:
+                self.errors += 1
+                log.error("Error writing %d reads to journal: %s", count, e)
+        self.commit_latency.record(time.monotonic_ns() - start)
@@ -0,0 +1,141 @@
+import os
+import time
+import threading
+
+from metrics import PrometheusText
+from rfid_reader import RFIDReader
+
+
+class ReaderManager:
+    """Runs several RFIDReader instances (start, finish, splits) side by side.
+
+    Every reader has its own port and threads, so a slow or stalled port
+    only affects its own gate. All readers share one event journal, one
+    update feed for /stream, one participant index and one leaderboard;
+    the journal only queues events on append, so readers never wait on
+    each other's disk writes.
+    """
+
+    def __init__(self, primary):
+        self.primary = primary  # The reader configured from the settings form
+        self.readers = {primary.reader_id: primary}
+        self.lock = threading.Lock()
+        self.last_health = {}  # reader_id -> (monotonic time, frames_read, bytes_read)
+        primary.manager = self
+
+    def add_reader(self, reader_id, gate, port, baud_rate=57600):
+        """Create a reader for ``gate`` on ``port`` and connect it. Returns (success, message)."""
+        if not reader_id or gate == "Participants":
+            return False, "Invalid reader id or gate"
+        with self.lock:
+            if reader_id in self.readers:
+                return False, f"Reader {reader_id} already exists"
+            reader = RFIDReader(
+                reader_id=reader_id,
+                gate=gate,
+                journal=self.primary.open_journal(),
+                feed=self.primary.feed,
+                participants=self.primary.participants,
+                leaderboard=self.primary.leaderboard
+            )
+            reader.manager = self
+            reader.settings['output_file'] = self.primary.settings['output_file']
+            base, ext = os.path.splitext(self.primary.settings['csv_file'])
+            reader.settings['csv_file'] = f"{base}_{reader_id}{ext}"  # One CSV per reader
+            base, ext = os.path.splitext(self.primary.settings['read_journal_file'])
+            reader.settings['read_journal_file'] = f"{base}_{reader_id}{ext}"
+
+            success, message = reader.setup_connection(port, baud_rate)
+            if success:
+                self.readers[reader_id] = reader
+            return success, message
+
+    def remove_reader(self, reader_id):
+        with self.lock:
+            if reader_id == self.primary.reader_id or reader_id not in self.readers:
+                return False, f"Cannot remove reader {reader_id}"
+            reader = self.readers.pop(reader_id)
+        if reader.running:
+            reader.stop()
+        elif reader.transport:
+            reader.transport.close()
+        return True, f"Reader {reader_id} removed"
+
+    def get(self, reader_id):
+        return self.readers.get(reader_id)
+
+    def start_all(self):
+        return {reader_id: reader.start() for reader_id, reader in list(self.readers.items())
+                if not reader.running}
+
+    def stop_all(self):
+        # Stop in parallel so one port timing out does not hold up the rest
+        threads = [threading.Thread(target=reader.stop) for reader in list(self.readers.values())
+                   if reader.running]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def clear_data(self, sheet_name=None):
+        """Clear ``sheet_name`` (or everything) and the reads of every reader on a cleared gate.
+
+        The journal and workbook are shared and cleared once; each reader's
+        own read journal and tag index must go too, or recovery on its next
+        start would restore the cleared events as missing.
+        """
+        self.primary.clear_data(sheet_name)  # Resets the primary's reads if its gate is cleared
+        for reader in list(self.readers.values()):
+            if reader is not self.primary and sheet_name in (None, reader.settings['gate']):
+                reader.reset_reads()
+        # Connected browsers still show the cleared rows: replace their tables
+        self.primary.feed.publish_reset(self.stream_reset)
+
+    def stream_reset(self, records):
+        """The /stream message that replaces a client's table.
+
+        ``records`` maps reader id -> records published so far (see
+        UpdateFeed.position); each reader contributes exactly those rows.
+        """
+        rows = []
+        for reader_id, reader in list(self.readers.items()):
+            rows.extend(reader.get_data()[:records.get(reader_id, 0)])
+        return {
+            'reset': True,
+            'data': rows,
+            'stats': self.get_stream_stats(),
+            'is_running': self.primary.running
+        }
+
+    def get_stream_stats(self):
+        """Statistics for the UI, summed over all readers."""
+        readers = list(self.readers.values())
+        stats = dict(self.primary.get_stream_stats())  # The reader's dict is a shared snapshot
+        stats['total_reads'] = sum(len(reader.current_data) for reader in readers)
+        return stats
+
+    def health(self):
+        """Per-reader health, with read rates measured since the previous call."""
+        now = time.monotonic()
+        result = []
+        for reader_id, reader in list(self.readers.items()):
+            health = reader.get_health()
+            previous = self.last_health.get(reader_id)
+            if previous and now > previous[0]:
+                elapsed = now - previous[0]
+                health['frames_per_second'] = round((health['frames_read'] - previous[1]) / elapsed, 1)
+                health['bytes_per_second'] = round((health['bytes_read'] - previous[2]) / elapsed, 1)
+            else:
+                health['frames_per_second'] = None
+                health['bytes_per_second'] = None
+            self.last_health[reader_id] = (now, health['frames_read'], health['bytes_read'])
+            result.append(health)
+        return result
+
+    def metrics_text(self):
+        """Prometheus text exposition for all readers."""
+        out = PrometheusText()
+        for reader in list(self.readers.values()):
+            reader.collect_metrics(out)
+        self.primary.collect_shared_metrics(out)
+        return out.render()
@@ -0,0 +1,227 @@
+import sqlite3
+import logging
+import time
+import threading
+from datetime import datetime
+from queue import Queue, Empty
+
+from openpyxl import Workbook, load_workbook
+
+from metrics import LatencyStats
+from participants import PARTICIPANT_HEADERS
+
+TIMING_SHEETS = ["Start", "Finish"]
+
+log = logging.getLogger(__name__)
+
+
+def timestamp_us(timestamp):
+    """Epoch microseconds of a local 'YYYY-mm-dd HH:MM:SS[.ffffff]' timestamp, or None."""
+    try:
+        return int(datetime.fromisoformat(timestamp).timestamp() * 1_000_000)
+    except (TypeError, ValueError):
+        return None
+
+
+class ResultJournal:
+    """Append-only store for Start/Finish events backed by SQLite in WAL mode.
+
+    ``append`` only queues the event; a single writer thread inserts
+    queued events in batches, one transaction each. Several readers can
+    share one journal without waiting on each other's disk writes, and
+    the cost of an append does not depend on how many events were already
+    recorded. Queries flush the queue first so they see every event.
+
+    The Excel workbook is generated from the journal only when someone
+    asks for it (see ``export_xlsx``).
+    """
+
+    def __init__(self, path, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints, no fsync per commit
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"  # Ids are never reused, even after clear()
+            " gate TEXT NOT NULL,"
+            " epc TEXT NOT NULL,"
+            " timestamp TEXT NOT NULL,"
+            " ts_us INTEGER)"  # The timestamp as epoch microseconds, for arithmetic in SQL
+        )
+        self._add_ts_us()
+        self.conn.execute("CREATE INDEX IF NOT EXISTS events_gate ON events (gate, id)")
+        self.conn.commit()
+        self.queue = Queue()
+        self.appended = 0
+        self.flush_latency = LatencyStats()  # Time to commit one batch
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def _add_ts_us(self):
+        """Add and fill the ts_us column in journals created before it existed."""
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(events)")]
+        if 'ts_us' in columns:
+            return
+        self.conn.execute("ALTER TABLE events ADD COLUMN ts_us INTEGER")
+        rows = self.conn.execute("SELECT id, timestamp FROM events").fetchall()
+        self.conn.executemany("UPDATE events SET ts_us = ? WHERE id = ?",
+                              [(timestamp_us(timestamp), row_id) for row_id, timestamp in rows])
+
+    def append(self, gate, epc, timestamp, ts_us=None):
+        """Queue one event for ``gate`` (e.g. "Start" or "Finish").
+
+        ``ts_us`` is the same instant as epoch microseconds; if omitted it
+        is parsed from ``timestamp`` on the writer thread.
+        """
+        self.queue.put((gate, epc, timestamp, ts_us))
+
+    def flush(self):
+        """Block until every queued event is committed."""
+        self.queue.join()
+
+    def _write_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except Empty:
+                    break
+                if item is None:
+                    stop = True
+                    self.queue.task_done()
+                    break
+                batch.append(item)
+            start = time.monotonic_ns()
+            rows = [event if event[3] is not None else event[:3] + (timestamp_us(event[2]),)
+                    for event in batch]
+            try:
+                with self.lock:
+                    self.conn.executemany(
+                        "INSERT INTO events (gate, epc, timestamp, ts_us) VALUES (?, ?, ?, ?)", rows
+                    )
+                    self.conn.commit()
+                self.appended += len(batch)
+            except Exception as e:
+                log.error("Error writing %d events to journal: %s", len(batch), e)
+            self.flush_latency.record(time.monotonic_ns() - start)
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                return
+
+    def gates(self):
+        """Gates that have events, Start and Finish first."""
+        self.flush()
+        with self.lock:
+            found = [row[0] for row in self.conn.execute("SELECT DISTINCT gate FROM events")]
+        return [g for g in TIMING_SHEETS if g in found] + sorted(g for g in found if g not in TIMING_SHEETS)
+
+    def events(self, gate):
+        """Return ``(epc, timestamp)`` pairs for ``gate`` in the order they were recorded."""
+        self.flush()
+        with self.lock:
+            return self.conn.execute(
+                "SELECT epc, timestamp FROM events WHERE gate = ? ORDER BY id", (gate,)
+            ).fetchall()
+
+    def results(self, start_gate="Start", finish_gate="Finish"):
+        """Map EPC -> (start, finish, start_us, finish_us, duration_us) in one query.
+
+        The latest event of each EPC per gate counts; the duration is
+        computed by SQLite from ts_us and is None unless both are known.
+        """
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute(
+                "WITH latest AS ("
+                " SELECT MAX(id) AS id FROM events WHERE gate IN (?, ?) GROUP BY gate, epc)"
+                " SELECT epc,"
+                " MAX(CASE WHEN gate = ? THEN timestamp END),"
+                " MAX(CASE WHEN gate = ? THEN timestamp END),"
+                " MAX(CASE WHEN gate = ? THEN ts_us END) AS start_us,"
+                " MAX(CASE WHEN gate = ? THEN ts_us END) AS finish_us,"
+                " MAX(CASE WHEN gate = ? THEN ts_us END) - MAX(CASE WHEN gate = ? THEN ts_us END)"
+                " FROM events JOIN latest USING (id) GROUP BY epc",
+                (start_gate, finish_gate, start_gate, finish_gate, start_gate, finish_gate,
+                 finish_gate, start_gate)
+            ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def event_keys(self, gate):
+        """Set of ``(epc, ts_us)`` recorded for ``gate``, to find events missing after a crash."""
+        self.flush()
+        with self.lock:
+            return set(self.conn.execute("SELECT epc, ts_us FROM events WHERE gate = ?", (gate,)))
+
+    def version(self):
+        """``(latest event id, event count)``; changes whenever the journal does."""
+        self.flush()
+        with self.lock:
+            return self.conn.execute("SELECT COALESCE(MAX(id), 0), COUNT(*) FROM events").fetchone()
+
+    def clear(self, gate=None):
+        """Delete the events of one gate, or all events."""
+        self.flush()
+        with self.lock:
+            if gate:
+                self.conn.execute("DELETE FROM events WHERE gate = ?", (gate,))
+            else:
+                self.conn.execute("DELETE FROM events")
+            self.conn.commit()
+
+    def export_xlsx(self, output_file, participants=None):
+        """Rewrite the Start, Finish and split gate sheets of ``output_file`` from the journal.
+
+        Other sheets (Participants) are kept as they are. If
+        ``participants`` rows are given the file is instead written from
+        scratch in write-only mode, with those rows as the Participants
+        sheet, without loading the old file.
+        """
+        gates = TIMING_SHEETS + [g for g in self.gates() if g not in TIMING_SHEETS]
+        if participants is not None:
+            workbook = Workbook(write_only=True)
+            for sheet_name in gates:
+                self._fill_sheet(workbook.create_sheet(sheet_name), sheet_name)
+            sheet = workbook.create_sheet("Participants")
+            sheet.append(PARTICIPANT_HEADERS)
+            for row in participants:
+                sheet.append(row)
+            workbook.save(output_file)
+            return
+
+        try:
+            workbook = load_workbook(output_file)
+        except FileNotFoundError:
+            workbook = Workbook()
+            workbook.remove(workbook.active)
+
+        for position, sheet_name in enumerate(gates):
+            if sheet_name in workbook.sheetnames:
+                workbook.remove(workbook[sheet_name])
+            self._fill_sheet(workbook.create_sheet(sheet_name, position), sheet_name)
+
+        if "Participants" not in workbook.sheetnames:
+            sheet = workbook.create_sheet("Participants")
+            sheet.append(PARTICIPANT_HEADERS)
+        workbook.save(output_file)
+
+    def _fill_sheet(self, sheet, gate):
+        sheet.append(["EPC", "Timestamp", "Gate"])
+        for epc, timestamp in self.events(gate):
+            sheet.append([epc, timestamp, gate])
+
+    def close(self):
+        """Commit queued events and close the database."""
+        self.queue.put(None)
+        self.writer.join()
+        with self.lock:
+            self.conn.close()
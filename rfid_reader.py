@@ -1,56 +1,113 @@
 import serial
-import csv
 import time
 import glob
-from datetime import datetime
 import threading
 import serial.tools.list_ports
 from threading import Thread
-from queue import Queue
 import os
-from openpyxl import Workbook, load_workbook
+import logging
+from openpyxl import load_workbook
+
+import config
+from frame_parser import FrameDecoder, EPC_START, EPC_END, RSSI_OFFSET, ANTENNA_OFFSET
+from chunk_buffer import ChunkBuffer
+from command_scheduler import CommandScheduler
+from clock import WallClock
+from csv_writer import CsvWriter
+import export_worker
+from exporters import MERGED_HEADERS, export_table, merged_rows, write_export
+from leaderboard import Leaderboard
+from metrics import DelaySampler, LatencyStats
+from participants import ParticipantIndex, BIB_COLUMN, NAME_COLUMN, iter_roster, roster_size, validate_roster
+from read_journal import ReadJournal
+from result_journal import ResultJournal
+from simulator import CaptureWriter
+from tag_store import TagRead, TagStore
+from update_feed import UpdateFeed
+from transport import SerialTransport
+from ingest_process import SharedMemoryTransport
+from logging_setup import HexDump
+
+CSV_FIELDNAMES = ['timestamp', 'epc', 'rssi', 'antenna_port', 'detected_as']
+PROGRESS_ROWS = 1000  # Export rows between progress reports
+
+log = logging.getLogger(__name__)
+raw_log = logging.getLogger(__name__ + '.raw')  # Hex dumps of raw chunks, see config.LOG_RAW_PACKETS
 
 
 class RFIDReader:
-    def __init__(self):
-        self.serial_conn = None
-        self.current_data = []
+    def __init__(self, reader_id='main', gate=config.DEFAULT_GATE, journal=None, feed=None, participants=None,
+                 leaderboard=None):
+        # journal, feed, participants and leaderboard can be shared between readers (see ReaderManager)
+        self.reader_id = reader_id
+        self.manager = None  # ReaderManager this reader belongs to, if any
+        self.transport = None  # Link to the reader (serial port, pty or replay source)
+        self.current_data = []  # TagRead per accepted read, formatted by format_read() on the way out; append-only
+        self.snapshot_lock = threading.Lock()  # Serialises snapshot rebuilds; never taken by process_data
+        self.data_snapshot = ()  # Formatted rows of current_data returned by get_data()
+        self.stats_snapshot = (0, None)  # (read count, dict) returned by get_stream_stats()
+        self.tag_store = TagStore()  # Per-EPC index used for deduplication
+        self.feed = feed or UpdateFeed()  # Serialized updates for /stream clients
+        self.participants = participants or ParticipantIndex()  # Roster from the Participants sheet
+        self.leaderboard = leaderboard or Leaderboard(self.participants)  # Live ranking, see get_leaderboard()
         self.raw_packets = []
         self.settings = {
             'serial_port': None,
             'baud_rate': 57600,
-            'output_file': 'rfid_data.xlsx'
+            'output_file': 'rfid_data.xlsx',
+            'csv_file': config.DEFAULT_CSV_FILE,
+            'journal_file': config.DEFAULT_JOURNAL_FILE,
+            'read_journal_file': config.DEFAULT_READ_JOURNAL_FILE,
+            'gate': gate  # Gate id; also the sheet new reads are recorded to
         }
         self.lock = threading.Lock()
         self.running = False
         self.thread = None
         self.process_thread = None
-        self.data_queue = Queue()  # Thread-safe queue for incoming data
-        self.last_inventory_time = 0
+        self.csv_writer = None  # Background CSV writer, alive while the reader runs
+        self.journal = journal  # Start/Finish event journal, see open_journal()
+        self.read_journal = None  # Binary log of accepted reads, replayed by recover_reads() on first start
+        self.export_lock = threading.Lock()
+        self.exported_version = {}  # Journal version last exported, per output file
+        self.data_queue = ChunkBuffer()  # Bounded handoff of raw chunks from read_loop to process_queue
+        self.scheduler = None  # CommandScheduler that owns writes while the reader runs
         self.num_antennas = 0  # Will be dynamically set after querying the reader
         self.current_antenna = 1  # Track the current antenna port being used
+        self.chunk_latency = LatencyStats()  # Time from read() returning to the chunk being parsed
+        self.decoder = None  # FrameDecoder owned by the processing thread
+        self.bytes_read = 0
+        self.frames_read = 0  # Valid tag frames, including repeats
+        self.dedup_hits = 0  # Frames for tags already seen
+        self.invalid_antenna = 0
+        self.lock_wait = LatencyStats()  # Time process_data waited for self.lock when it was held
+        self.errors = 0
+        self.last_read_ns = None  # time.time_ns() of the last valid tag frame
+        self.clock = WallClock()  # Turns monotonic arrival stamps into epoch ns
+        self.ingest_delay = None  # DelaySampler while the ingest-to-decode delay is measured
+        self.capture = None  # CaptureWriter recording raw chunks for replay, see start_capture()
+        self.log_fields = {'reader': reader_id}  # Structured context added to every log record
 
     def query_antenna_ports(self):
         """Query the RFID reader to determine the number of supported antenna ports."""
-        if self.serial_conn and self.serial_conn.is_open:
+        if self.transport and self.transport.is_open:
             try:
                 # Send a command to query the number of antenna ports
                 query_cmd = bytearray([0xA0, 0x02, 0x80, 0x22])  # Example command (adjust for your reader)
-                self.serial_conn.write(query_cmd)
-                time.sleep(0.1)  # Wait for the response
+                self.transport.write(query_cmd)
 
                 # Read the response (adjust based on your reader's protocol)
-                response = self.serial_conn.read(10)  # Adjust the number of bytes to read
+                # Wait for the whole header; a single read returns after the first byte
+                response = self.transport.read_at_least(4, 10, timeout=config.SERIAL_TIMEOUT)
                 if len(response) >= 4:  # Ensure we have a valid response
                     self.num_antennas = response[3]  # Extract the number of antenna ports
-                    print(f"Detected {self.num_antennas} antenna ports on the reader.")
+                    log.info("Detected %d antenna ports on the reader", self.num_antennas, extra=self.log_fields)
                     return True
                 else:
-                    print("Failed to query antenna ports. Using default (4 ports).")
+                    log.warning("Failed to query antenna ports, using default (4 ports)", extra=self.log_fields)
                     self.num_antennas = 4  # Fallback to a default value
                     return False
             except Exception as e:
-                print(f"Error querying antenna ports: {e}")
+                log.error("Error querying antenna ports: %s", e, extra=self.log_fields)
                 self.num_antennas = 4  # Fallback to a default value
                 return False
         return False
@@ -112,83 +169,101 @@ class RFIDReader:
     def setup_connection(self, port, baud_rate=57600):
         """Establish a serial connection with the UHF reader."""
         try:
-            self.serial_conn = serial.Serial(
-                port=port,
-                baudrate=baud_rate,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                bytesize=serial.EIGHTBITS,
-                timeout=2,  # Increase timeout to 2 seconds
-                write_timeout=2,  # Set write timeout
-                rtscts=True,  # Enable hardware flow control (if supported)
-                dsrdtr=True  # Enable hardware flow control (if supported)
-            )
+            if config.MULTIPROCESS:
+                transport = SharedMemoryTransport(port, baud_rate)  # The port is read in its own process
+            else:
+                transport = SerialTransport(port, baud_rate, read_timeout=config.READ_TIMEOUT)
+            self.attach_transport(transport)
             self.settings['serial_port'] = port
             self.settings['baud_rate'] = baud_rate
             return True, f"Successfully connected to {port}"
-        except serial.SerialException as e:
+        except (serial.SerialException, OSError) as e:
             return False, f"Error connecting to {port}: {e}"
+
+    def attach_transport(self, transport):
+        """Use an already opened transport (serial, pty or replay) as the reader link."""
+        if self.transport and self.transport is not transport and not self.running:
+            self.transport.close()
+        self.transport = transport
     
     def stop(self):
         """Stop the RFID reader and processing threads."""
         self.running = False
+        self.data_queue.close()  # Releases read_loop if it waits for room
+        if self.scheduler:
+            self.scheduler.stop()  # Stop queued commands before sending our own
         
         # Stop inventory if active for Chaofan reader
-        if self.serial_conn and self.serial_conn.is_open:
+        if self.transport and self.transport.is_open:
             try:
                 # Using the Chaofan command to stop inventory
                 stop_cmd = bytearray([0xA0, 0x03, 0x00, 0xA3])
-                self.serial_conn.write(stop_cmd)
+                self.transport.write(stop_cmd)
                 time.sleep(0.1)
             except Exception as e:
-                print(f"Error sending stop command: {e}")
+                log.error("Error sending stop command: %s", e, extra=self.log_fields)
         
         if self.thread:
             self.thread.join(timeout=2)  # Wait for the read_loop thread to finish with timeout
         if self.process_thread:
             self.process_thread.join(timeout=2)  # Wait for the process_queue thread to finish with timeout
-        if self.serial_conn:
-            self.serial_conn.close()  # Close the serial connection
+        if self.csv_writer:
+            self.csv_writer.stop()  # Flush and close the CSV file
+        if self.read_journal:
+            self.read_journal.stop()  # Commit the last reads
+        if self.transport:
+            self.transport.close()  # Close the serial connection
+        self.publish_update()  # Let the UI know the reader stopped
         return True, "Reader stopped"
     
-    def write_to_excel(self, tag_data, sheet_name):
-        """Write tag data to a specific sheet in the Excel file."""
+    def open_journal(self):
+        """Return the Start/Finish event journal, opening it on first use."""
+        if self.journal is None:
+            self.journal = ResultJournal(self.settings['journal_file'])
+        return self.journal
+
+    def write_to_excel(self, tag_data, sheet_name, ts_us=None):
+        """Record tag data for a sheet ("Start" or "Finish").
+
+        The event is appended to the journal; the Excel file itself is
+        only rebuilt by export_excel().
+        """
         try:
-            if os.path.exists(self.settings['output_file']):
-                workbook = load_workbook(self.settings['output_file'])
-            else:
-                workbook = Workbook()
-                # Remove the default sheet and create Start, Finish, and Participants sheets
-                workbook.remove(workbook.active)
-                workbook.create_sheet("Start")
-                workbook.create_sheet("Finish")
-                workbook.create_sheet("Participants")
-
-            sheet = workbook[sheet_name]
-            if sheet.max_row == 1:  # Add headers if the sheet is empty
-                if sheet_name in ["Start", "Finish"]:
-                    sheet.append(["EPC", "Timestamp", "Gate"])
-                elif sheet_name == "Participants":
-                    sheet.append(["Member NO", "Nama", "Alamat", "Gender", "EPC", "Country", "Status"])
-
-            if sheet_name in ["Start", "Finish"]:
-                sheet.append([tag_data['epc'], tag_data['timestamp'], sheet_name])
-            workbook.save(self.settings['output_file'])
-            print(f"Data saved to {sheet_name} sheet in {self.settings['output_file']}")
+            self.open_journal().append(sheet_name, tag_data['epc'], tag_data['timestamp'], ts_us)
         except Exception as e:
-            print(f"Error saving to Excel file: {e}")
+            log.error("Error saving to journal: %s", e, extra=self.log_fields)
+
+    def export_excel(self):
+        """Write the journal to the Start/Finish sheets of the output file if it changed."""
+        with self.export_lock:
+            journal = self.open_journal()
+            version = journal.version()
+            output_file = self.settings['output_file']
+            if version == self.exported_version.get(output_file) and os.path.exists(output_file):
+                return
+            if config.MULTIPROCESS:
+                export_worker.run(export_worker.export_workbook, self.settings['journal_file'], output_file)
+            else:
+                journal.export_xlsx(output_file)
+            self.exported_version[output_file] = version
+            self.participants.mark_current(output_file)  # Participants sheet was copied unchanged
 
     def clear_data(self, sheet_name=None):
         """Clear data from a specific sheet or all sheets."""
         try:
+            if sheet_name != "Participants":
+                self.open_journal().clear(sheet_name)  # None clears every gate
+                self.leaderboard.invalidate()
+            if sheet_name in (None, self.settings['gate']):
+                self.reset_reads()  # Otherwise the cleared tags would come back on the next restart
             if not os.path.exists(self.settings['output_file']):
-                print(f"File {self.settings['output_file']} does not exist.")
+                log.warning("File %s does not exist", self.settings['output_file'])
                 return
 
             workbook = load_workbook(self.settings['output_file'])
             if sheet_name:
                 if sheet_name not in workbook.sheetnames:
-                    print(f"Sheet {sheet_name} does not exist.")
+                    log.warning("Sheet %s does not exist", sheet_name)
                     return
                 sheet = workbook[sheet_name]
                 sheet.delete_rows(2, sheet.max_row)  # Delete all rows except headers
@@ -198,182 +273,297 @@ class RFIDReader:
                         sheet = workbook[sheet_name]
                         sheet.delete_rows(2, sheet.max_row)
             workbook.save(self.settings['output_file'])
-            print(f"Data cleared from {sheet_name if sheet_name else 'all sheets'}.")
-        except Exception as e:
-            print(f"Error clearing Excel file: {e}")
-
-    def import_participants(self, file_path):
-        """Import participant data from an Excel file."""
-        try:
-            if not os.path.exists(file_path):
-                print(f"File {file_path} does not exist.")
-                return
-
-            workbook = load_workbook(file_path)
-            sheet = workbook.active
-            participants = []
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                participants.append({
-                    "Member NO": row[0],
-                    "Nama": row[1],
-                    "Alamat": row[2],
-                    "Gender": row[3],
-                    "EPC": row[4],
-                    "Country": row[5],
-                    "Status": row[6]
-                })
-
-            if not os.path.exists(self.settings['output_file']):
-                # Create a new workbook if it doesn't exist
-                workbook = Workbook()
-                workbook.remove(workbook.active)  # Remove default sheet
-                workbook.create_sheet("Start")
-                workbook.create_sheet("Finish")
-                workbook.create_sheet("Participants")
-                workbook.save(self.settings['output_file'])
-
-            workbook = load_workbook(self.settings['output_file'])
-            if "Participants" not in workbook.sheetnames:
-                workbook.create_sheet("Participants")
-            sheet = workbook["Participants"]
-            sheet.delete_rows(2, sheet.max_row)  # Clear existing data
-            for participant in participants:
-                sheet.append(list(participant.values()))
-            workbook.save(self.settings['output_file'])
-            print("Participant data imported successfully.")
+            log.info("Data cleared from %s", sheet_name if sheet_name else 'all sheets')
         except Exception as e:
-            print(f"Error importing participant data: {e}")
+            log.error("Error clearing Excel file: %s", e)
+
+    def import_participants(self, file_path, progress=None):
+        """Replace the roster with an xlsx or CSV file. Returns the number of participants.
+
+        The file is streamed and validated in one pass (see
+        participants.validate_roster); nothing changes if any row is
+        invalid. The output workbook is then written in one go and the
+        index replaced. ``progress(done, total, stage)`` reports rows read.
+        Raises RosterError, OSError or an openpyxl error for unreadable files.
+        """
+        output_file = self.settings['output_file']
+        if config.MULTIPROCESS:
+            # Parsed, validated and saved by the export worker; only the stage is reported
+            if progress:
+                progress(0, None, 'importing')
+            with self.export_lock:
+                version = self.open_journal().version()
+                rows = export_worker.run(export_worker.import_roster, file_path,
+                                         self.settings['journal_file'], output_file)
+                self.exported_version[output_file] = version
+        else:
+            total = roster_size(file_path)
+            if progress:
+                progress(0, total, 'validating')
+            rows = validate_roster(iter_roster(file_path),
+                                   progress and (lambda done: progress(done, total, 'validating')))
+            if progress:
+                progress(len(rows), len(rows), 'saving')
+            with self.export_lock:  # Start/Finish sheets are rewritten from the journal as well
+                journal = self.open_journal()
+                version = journal.version()
+                journal.export_xlsx(output_file, participants=rows)
+                self.exported_version[output_file] = version
+        # Refresh the index from what we just wrote instead of re-reading the file
+        self.participants.set_rows(rows, output_file, os.path.getmtime(output_file))
+        log.info("Imported %d participants", len(rows))
+        return len(rows)
+
+    def load_participants(self):
+        """Return the participant index, reloading it if the output file changed."""
+        self.participants.load(self.settings['output_file'])
+        return self.participants
+
+    def iter_merged_data(self):
+        """Return an iterator over one row per participant, in MERGED_HEADERS order.
+
+        Start/Finish times and durations come from a single journal query
+        on integer timestamps; rows are produced lazily so exports of large
+        fields do not build the whole table in memory. Raises like
+        load_participants() if the roster cannot be read.
+        """
+        # Participants by EPC, re-read only if the file changed
+        participants = self.load_participants().by_epc
+        return merged_rows(participants, self.open_journal().results())
+
+    def export_key(self, dataset):
+        """What ``dataset`` (see exporters.export_table) depends on; equal keys mean equal exports.
+
+        Gate sheets change with the journal version, the merged table with
+        the participant roster as well.
+        """
+        version = self.open_journal().version()
+        if dataset == 'merged':
+            return version + (self.load_participants().version,)
+        return version
+
+    def write_export(self, dataset, fmt, path, progress=None):
+        """Write ``dataset`` to ``path`` as ``fmt`` (one of exporters.EXPORT_FORMATS).
+
+        ``progress(done, total)`` is called every PROGRESS_ROWS rows. In
+        multiprocess mode workbooks are written by the export worker, without
+        progress; CSV and JSON are cheaper to write here than to hand over.
+        """
+        if config.MULTIPROCESS and fmt == 'xlsx':
+            self.open_journal().flush()  # The worker reads the journal file itself
+            export_worker.run(export_worker.export_dataset, self.settings['output_file'],
+                              self.settings['journal_file'], dataset, fmt, path)
+            return
+        participants = self.load_participants().by_epc if dataset == 'merged' else None
+        headers, rows, sheet_name = export_table(dataset, self.open_journal(), participants)
+        if progress:
+            rows = self._report_rows(rows, progress, len(participants) if participants is not None else None)
+        write_export(path, fmt, headers, rows, sheet_name)
+
+    @staticmethod
+    def _report_rows(rows, progress, total):
+        done = 0
+        for row in rows:
+            yield row
+            done += 1
+            if done % PROGRESS_ROWS == 0:
+                progress(done, total)
+        progress(done, done)
+
+    def get_leaderboard(self):
+        """Return the live ranking, rebuilding it from the journal if needed."""
+        if not self.leaderboard.loaded:
+            self.leaderboard.rebuild(self.open_journal().results())
+        return self.leaderboard
 
     def get_merged_data(self):
         """Merge data from Start, Finish, and Participants sheets."""
         try:
             if not os.path.exists(self.settings['output_file']):
                 return []
-
-            workbook = load_workbook(self.settings['output_file'])
-            start_sheet = workbook["Start"]
-            finish_sheet = workbook["Finish"]
-            participants_sheet = workbook["Participants"]
-
-            # Create a dictionary of participants by EPC
-            participants = {}
-            for row in participants_sheet.iter_rows(min_row=2, values_only=True):
-                participants[row[4]] = row  # EPC is the key
-
-            # Create dictionaries for start and finish timestamps by EPC
-            start_timestamps = {}
-            for row in start_sheet.iter_rows(min_row=2, values_only=True):
-                epc = row[0]
-                timestamp = row[1]
-                start_timestamps[epc] = timestamp
-
-            finish_timestamps = {}
-            for row in finish_sheet.iter_rows(min_row=2, values_only=True):
-                epc = row[0]
-                timestamp = row[1]
-                finish_timestamps[epc] = timestamp
-
-            # Merge data
-            merged_data = []
-            for epc in participants:
-                nama = participants[epc][1]
-                bib = participants[epc][0]
-                start_time = start_timestamps.get(epc)
-                finish_time = finish_timestamps.get(epc)
-
-                # Calculate duration if both start and finish times are available
-                duration = ""
-                if start_time and finish_time:
-                    start_dt = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
-                    finish_dt = datetime.strptime(finish_time, "%Y-%m-%d %H:%M:%S")
-                    delta = finish_dt - start_dt
-                    duration = str(delta)  # Format as HH:mm:ss
-
-                merged_data.append({
-                    "EPC": epc,
-                    "NAMA": nama,
-                    "BIB": bib,
-                    "Start Timestamp": start_time if start_time else "N/A",
-                    "Finish Timestamp": finish_time if finish_time else "N/A",
-                    "Duration": duration
-                })
-
-            return merged_data
+            return [dict(zip(MERGED_HEADERS, row)) for row in self.iter_merged_data()]
         except Exception as e:
-            print(f"Error merging data: {e}")
+            log.exception("Error merging data: %s", e)
             return []
-    
+
+    def recover_reads(self):
+        """Rebuild the tag index and current_data from the read journal.
+
+        Replaying every logged read through the TagStore reproduces the
+        same first reads (and passes) as the live session, so recovered
+        tags are not reported twice. Start/Finish events that were still
+        queued for the event journal when the app died are re-added.
+        Returns the number of reads replayed.
+        """
+        started = time.monotonic()
+        records = self.read_journal.recover()
+        if self.read_journal.truncated_bytes:
+            log.warning("Read journal: dropped %d bytes of an incomplete commit", self.read_journal.truncated_bytes,
+                        extra=self.log_fields)
+        if not records:
+            return 0
+
+        recovered = []
+        with self.lock:
+            tag_store = self.tag_store
+            update = tag_store.update
+            immediate = not tag_store.pass_window_ns
+            for epc, time_ns, rssi, antenna in records:
+                entry, is_new = update(epc, rssi, antenna, time_ns)
+                if is_new and immediate:
+                    recovered.append(TagRead(entry.epc, time_ns, rssi, antenna))
+                elif tag_store.pending and tag_store.pending[0][0] <= time_ns:
+                    recovered.extend(tag_store.expire(time_ns))
+            recovered.extend(tag_store.expire())  # Passes cut short by the crash end at their last read
+            self.current_data.extend(recovered)
+
+        gate = self.settings['gate']
+        journal = self.open_journal()
+        known = journal.event_keys(gate)
+        missing = [read for read in recovered if (read.epc_hex, read.time_us) not in known]
+        for read in missing:
+            journal.append(gate, read.epc_hex, read.timestamp(), read.time_us)
+        if missing:
+            self.leaderboard.invalidate()
+
+        for index in range(0, len(recovered), 1000):
+            self.publish_update([self.format_read(read) for read in recovered[index:index + 1000]])
+        log.info("Recovered %d reads (%d tags, %d missing events) in %.2f s", len(records), len(recovered),
+                 len(missing), time.monotonic() - started, extra=self.log_fields)
+        return len(records)
+
+    def reset_reads(self):
+        """Forget every read of this session, in memory and in the read journal."""
+        with self.lock:
+            self.tag_store.clear()
+            self.current_data = []
+        with self.snapshot_lock:
+            self.data_snapshot = ()
+            self.stats_snapshot = (0, None)
+        self.feed.reset_source(self.reader_id)  # Snapshots for /stream must not count the cleared reads
+        if self.read_journal:
+            self.read_journal.reset()
+        elif os.path.exists(self.settings['read_journal_file']):
+            ReadJournal(self.settings['read_journal_file']).reset()
+
     def read_loop(self):
-        """Main reading loop with improved buffer handling for Chaofan reader."""
-        buffer = bytearray()
+        """Main reading loop for Chaofan reader.
+
+        Blocks on the transport until bytes arrive (bounded by
+        ``config.READ_TIMEOUT``) and hands each chunk, stamped with its
+        arrival time, to the processing thread.
+        """
         while self.running:
             try:
-                if self.serial_conn and self.serial_conn.in_waiting:
-                    # Read all available data
-                    new_data = self.serial_conn.read(self.serial_conn.in_waiting)
-                    if new_data:
-                        # For debugging
-                        # print(f"Received data: {' '.join([f'{b:02X}' for b in new_data])}")
-                        self.data_queue.put(new_data)
-                
-                # Periodically restart inventory to improve tag detection
-                current_time = time.time()
-                if current_time - self.last_inventory_time > 3:  # Every 3 seconds
-                    self.start_fast_inventory()
-                    self.last_inventory_time = current_time
-                
-                time.sleep(0.01)  # Small delay to prevent CPU hogging
+                # Wakes as soon as data arrives and returns everything buffered
+                new_data = self.transport.read(config.READ_CHUNK_SIZE, timeout=config.READ_TIMEOUT)
+                if new_data:
+                    # Transports fed by the ingest process carry the stamp taken there
+                    arrival_ns = self.transport.arrival_ns or time.monotonic_ns()
+                    self.bytes_read += len(new_data)
+                    if raw_log.isEnabledFor(logging.DEBUG):
+                        raw_log.debug("Received %s", HexDump(new_data), extra=self.log_fields)
+                    self.data_queue.put(arrival_ns, new_data)  # Applies the overflow policy when full
+                    capture = self.capture
+                    if capture:
+                        capture.write(new_data, arrival_ns)
             except Exception as e:
-                print(f"Error in read loop: {e}")
+                self.errors += 1
+                log.error("Error in read loop: %s", e, extra=self.log_fields)
                 time.sleep(0.1)  # Longer delay after error
 
+    def measure_ingest_delay(self, enabled=True, capacity=config.INGEST_DELAY_SAMPLES):
+        """Start (or restart) or stop sampling the delay from bytes arriving to each frame being decoded.
+
+        Returns the summary of the measurement that was running, if any.
+        """
+        sampler = self.ingest_delay
+        self.ingest_delay = DelaySampler(capacity) if enabled else None
+        return sampler.summary() if sampler else None
+
+    def start_capture(self, path):
+        """Record every raw chunk read from the reader to ``path`` (see simulator.py for replay)."""
+        self.stop_capture()
+        self.capture = CaptureWriter(path)
+
+    def stop_capture(self):
+        capture, self.capture = self.capture, None
+        if capture:
+            capture.close()
+
     def process_queue(self):
         """Process data from the queue."""
-        buffer = bytearray()  # Buffer to accumulate data across queue entries
+        # Accumulates data across queue entries; also yields command responses
+        decoder = FrameDecoder(max_response_length=config.MAX_RESPONSE_LENGTH)
+        self.decoder = decoder
         
         while self.running:
             try:
-                if not self.data_queue.empty():
-                    data = self.data_queue.get()
-                    
-                    # Add to our accumulating buffer
-                    buffer.extend(data)
-                    
-                    # Process complete packets from the buffer
-                    i = 0
-                    while i < len(buffer):
-                        # Check for Chaofan packet structure
-                        if len(buffer) - i >= 21:
-                            # For debugging
-                            # print(f"Processing potential packet: {' '.join([f'{b:02X}' for b in buffer[i:i+21]])}")
-                            # Process the packet and check if it was valid
-                            if self.process_data(buffer[i:i+21]):
-                                i += 21  # Move past this packet
-                            else:
-                                i += 1   # Not a valid packet, move one byte
+                # Block until the read loop hands over data, then take everything queued
+                batch = self.data_queue.get_batch(timeout=config.READ_TIMEOUT)
+                if not batch:
+                    self.check_clock()
+                    self.close_passes(self.clock.now())  # Nothing queued: passes due by now are complete
+                    continue
+                dequeued_ns = time.monotonic_ns()
+                for arrival_ns, data in batch:
+                    self.chunk_latency.record(dequeued_ns - arrival_ns)
+
+                    # Frames are views into the decoder buffer, valid for this iteration only
+                    for frame in decoder.feed(data):
+                        if raw_log.isEnabledFor(logging.DEBUG):
+                            raw_log.debug("Frame %s", HexDump(frame), extra=self.log_fields)
+                        if len(frame) == config.FRAME_LENGTH:
+                            self.process_data(frame, arrival_ns)
                         else:
-                            # Not enough data for a complete packet
-                            break
-                    
-                    # Keep only unprocessed data in the buffer
-                    if i > 0:
-                        buffer = buffer[i:]
-                
-                else:
-                    time.sleep(0.01)  # Small delay when queue is empty
+                            self.scheduler.on_response(frame)  # Acknowledgement of a command
+                # Every read that arrived before this chunk has been seen, so passes up to here are complete
+                self.close_passes(self.clock.to_wall(arrival_ns))
             except Exception as e:
-                print(f"Error processing data from queue: {e}")
+                self.errors += 1
+                log.exception("Error processing data from queue: %s", e, extra=self.log_fields)
                 time.sleep(0.1)  # Longer delay after error
+        self.close_passes()  # Stopping: report passes still inside their window
+
+    def check_clock(self):
+        """Follow a wall-clock step, e.g. after the machine slept, instead of stamping reads early."""
+        step_ns = self.clock.resync(int(config.CLOCK_RESYNC_THRESHOLD * 1e9))
+        if step_ns:
+            log.warning("Wall clock moved %.3f s from the read time base (suspend or clock step); recalibrated",
+                        step_ns / 1e9, extra=self.log_fields)
 
     def start(self):
         """Start the RFID reader and processing threads."""
-        if not self.serial_conn or not self.serial_conn.is_open:
+        if not self.transport or not self.transport.is_open:
             return False, "Serial connection not established"
         
         # Query the reader for the number of antenna ports
         self.query_antenna_ports()
 
+        # Load the roster up front so reads can be matched to names without disk access
+        try:
+            self.load_participants()
+        except (OSError, KeyError) as e:
+            log.warning("Participants not loaded: %s", e, extra=self.log_fields)
+
+        # After a restart or crash, pick up where the previous session stopped
+        if self.read_journal is None:
+            self.read_journal = ReadJournal(self.settings['read_journal_file'])
+            self.recover_reads()
+        self.read_journal.start()
+        self.get_leaderboard()  # Rank earlier events before new ones arrive
+
+        self.clock.calibrate()  # One offset for the whole run, see clock.WallClock
+        self.data_queue.reopen()
         self.running = True
+
+        # All writes to the reader go through the scheduler while running
+        self.scheduler = CommandScheduler(self.transport, self.inventory_commands)
+        self.scheduler.start()
+
+        # Start the CSV writer before any tag can be processed
+        self.csv_writer = CsvWriter(self.settings['csv_file'], CSV_FIELDNAMES)
+        self.csv_writer.start()
         
         # Start the reading thread
         self.thread = threading.Thread(target=self.read_loop, daemon=True)
@@ -383,10 +573,10 @@ class RFIDReader:
         self.process_thread = threading.Thread(target=self.process_queue, daemon=True)
         self.process_thread.start()
         
-        # Start initial inventory
+        # Start initial inventory; the scheduler refreshes it from here on
         self.start_fast_inventory()
-        self.last_inventory_time = time.time()
         
+        self.publish_update()
         return True, "Reader started"
     
     # def process_data(self, data):
@@ -422,130 +612,326 @@ class RFIDReader:
     #             return False  # Error processing packet
     #     return False  # Not a valid packet
     
-    def process_data(self, data):
-        """Process Chaofan UHF reader data packet and extract EPC and antenna port information."""
+    def process_data(self, data, arrival_ns=None):
+        """Process Chaofan UHF reader data packet and extract EPC and antenna port information.
+
+        ``arrival_ns`` is the ``time.monotonic_ns()`` at which read_loop
+        received the bytes; the read is timed from it, not from when the
+        frame got parsed.
+        """
         # Check if this looks like a valid Chaofan packet
-        if len(data) == 21:  # Expected length for Chaofan tag data
+        if len(data) == config.FRAME_LENGTH:  # Expected length for Chaofan tag data
             try:
-                # Extract EPC (12 bytes)
-                epc = data[6:18]
-                epc_hex = ''.join([f"{b:02X}" for b in epc])  # Convert to hex string
+                # Extract EPC (12 raw bytes; converted to hex only for new tags)
+                epc = bytes(data[EPC_START:EPC_END])
 
                 # Extract RSSI and antenna port number
-                rssi = data[18]
-                antenna_port = data[19]  # Antenna port number (1-N)
+                rssi = data[RSSI_OFFSET]
+                antenna_port = data[ANTENNA_OFFSET]  # Antenna port number (1-N)
 
                 # Validate antenna port number
                 if antenna_port < 1 or antenna_port > self.num_antennas:
-                    print(f"Invalid antenna port detected: {antenna_port}")
+                    self.invalid_antenna += 1
+                    log.warning("Invalid antenna port detected: %d", antenna_port, extra=self.log_fields)
                     return False
-
-                tag_data = {
-                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f'),
-                    'epc': epc_hex,
-                    'rssi': rssi,
-                    'antenna_port': antenna_port,
-                    'detected_as': 'chafon'
-                }
-
-                with self.lock:
-                    # Check if this is a new tag
-                    if not any(tag['epc'] == epc_hex for tag in self.current_data):
-                        self.current_data.append(tag_data)
-                        self.write_to_csv(tag_data)
-                        print(f"Tag found: {epc_hex}, RSSI: {rssi}, Antenna Port: {antenna_port}")
-                        print(f"Total tags processed: {len(self.current_data)}")
+                if self.scheduler:
+                    self.scheduler.note_read()  # Tag rate drives inventory refresh
+                self.frames_read += 1
+
+                if arrival_ns:
+                    now_ns = arrival_ns + self.clock.offset_ns
+                    if self.ingest_delay:
+                        self.ingest_delay.record(time.monotonic_ns() - arrival_ns)
+                else:
+                    now_ns = self.clock.now()
+                self.last_read_ns = now_ns
+                read_journal = self.read_journal
+                if read_journal:
+                    read_journal.append(epc, now_ns, rssi, antenna_port)  # Committed in groups by its thread
+                read = None
+                if not self.lock.acquire(blocking=False):
+                    # Contended: only then is the wait worth timing
+                    wait_start = time.perf_counter_ns()
+                    self.lock.acquire()
+                    self.lock_wait.record(time.perf_counter_ns() - wait_start)
+                try:
+                    # Constant-time lookup; repeats only update the tag's counters
+                    entry, is_new = self.tag_store.update(epc, rssi, antenna_port, now_ns)
+                    if not is_new:
+                        self.dedup_hits += 1
+                    elif not self.tag_store.pass_window_ns:
+                        read = TagRead(entry.epc, now_ns, rssi, antenna_port)
+                        self.current_data.append(read)
+                    # Otherwise the pass is reported by close_passes() once its window ends
+                finally:
+                    self.lock.release()
+                if read:
+                    self.report_read(read)
                 return True  # Valid packet processed
             except Exception as e:
-                print(f"Error parsing tag data: {e}")
+                log.error("Error parsing tag data: %s", e, extra=self.log_fields)
                 return False  # Error processing packet
         return False  # Not a valid packet
 
+    def close_passes(self, now_ns=None):
+        """Report every pass whose window ended by ``now_ns`` (epoch ns; all if None)."""
+        if not self.tag_store.pending:
+            return
+        with self.lock:
+            reads = self.tag_store.expire(now_ns)
+            self.current_data.extend(reads)
+        for read in reads:
+            self.report_read(read)
+
+    def report_read(self, read):
+        """Send an accepted read to the UI, CSV, event journal and leaderboard."""
+        # Formatted once, outside the lock, for the UI, CSV and journal
+        tag_data = self.format_read(read)
+        epc_hex = tag_data['epc']
+        # Logged outside the lock; the listener thread does the formatting and I/O
+        log.info("Tag found: %s", epc_hex, extra={
+            'reader': self.reader_id, 'rssi': read.rssi, 'antenna': read.antenna, 'total': len(self.current_data)})
+        gate = tag_data['gate']
+        self.write_to_csv(tag_data)  # Only enqueues the row
+        self.write_to_excel(tag_data, gate, read.time_us)
+        standing = self.get_leaderboard().record(gate, epc_hex, read.time_us)
+        self.publish_update([tag_data], [standing] if standing else ())
+
     def debug_print_bytes(self, data):
         """Print byte data in a readable format."""
         hex_str = ' '.join([f"{b:02X}" for b in data])
         return hex_str
     
     def write_to_csv(self, tag_data):
-        """Write tag data to CSV."""
-        try:
-            with open(self.settings['csv_file'], 'a', newline='') as csvfile:
-                fieldnames = ['timestamp', 'epc', 'rssi', 'antenna', 'detected_as']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                if csvfile.tell() == 0:
-                    writer.writeheader()
-                writer.writerow(tag_data)
-        except Exception as e:
-            print(f"Error saving to CSV: {e}")
+        """Queue tag data for the background CSV writer."""
+        if self.csv_writer:
+            self.csv_writer.submit(tag_data)
+
+    def format_read(self, read):
+        """The API/CSV form of a TagRead, with the participant it belongs to."""
+        epc_hex = read.epc_hex
+        participant = self.participants.find_epc(epc_hex)
+        return {
+            'timestamp': read.timestamp(),
+            'epc': epc_hex,
+            'rssi': read.rssi,
+            'antenna_port': read.antenna,
+            'detected_as': 'chafon',
+            'gate': self.settings['gate'],
+            'bib': participant[BIB_COLUMN] if participant else None,
+            'name': participant[NAME_COLUMN] if participant else None
+        }
 
     def get_data(self):
-        """Get current tag data."""
-        with self.lock:
-            return self.current_data.copy()
+        """Get current tag data as a tuple of row dicts; treat it as read-only.
+
+        current_data is append-only, so its length is its version: while no
+        read arrives the same tuple is returned, and new reads only format
+        the rows added since the last call. The reader lock is not taken.
+        """
+        reads = self.current_data
+        count = len(reads)
+        snapshot = self.data_snapshot
+        if len(snapshot) == count:
+            return snapshot
+        with self.snapshot_lock:
+            snapshot = self.data_snapshot
+            if len(snapshot) < count:
+                snapshot += tuple(self.format_read(read) for read in reads[len(snapshot):count])
+                self.data_snapshot = snapshot
+        return snapshot
+
+    def get_stream_stats(self):
+        """Get the statistics shown in the UI (cached per read count; do not modify)."""
+        reads = self.current_data
+        count = len(reads)
+        cached_count, stats = self.stats_snapshot
+        if stats is None or cached_count != count:
+            stats = {
+                'total_reads': count,
+                'last_read': reads[0].timestamp() if count else 'Never'
+            }
+            self.stats_snapshot = (count, stats)  # Swapped in one assignment, no lock needed
+        return stats
 
     def get_stats(self):
         """Get statistics about the current session."""
-        with self.lock:
-            return {
-                'total_reads': len(self.current_data),
-                'last_read': self.current_data[0]['timestamp'] if self.current_data else 'Never'
-            }
+        stats = dict(self.get_stream_stats())
+        stats.update({
+            'unique_tags': len(self.tag_store),
+            'dedup_hits': self.dedup_hits,
+            'open_passes': len(self.tag_store.pending),
+            'chunk_latency': self.chunk_latency.snapshot(),
+            'ingest_delay': self.ingest_delay.summary() if self.ingest_delay else None,
+            'clock': self.clock.stats(),
+            'lock_wait': self.lock_wait.snapshot(),
+            'data_queue': self.data_queue.stats(),
+            'csv_writer': self.csv_writer.stats() if self.csv_writer else None,
+            'read_journal': self.read_journal.stats() if self.read_journal else None,
+            'scheduler': self.scheduler.stats() if self.scheduler else None
+        })
+        return stats
+
+    def get_health(self):
+        """Liveness and throughput counters for this reader."""
+        return {
+            'reader_id': self.reader_id,
+            'gate': self.settings['gate'],
+            'serial_port': self.settings['serial_port'],
+            'running': self.running,
+            'connected': bool(self.transport and self.transport.is_open),
+            'bytes_read': self.bytes_read,
+            'frames_read': self.frames_read,
+            'unique_tags': len(self.tag_store),
+            'errors': self.errors,
+            'queue_depth': self.data_queue.qsize(),
+            'dropped_bytes': self.data_queue.dropped_bytes,
+            'seconds_since_read': round((time.time_ns() - self.last_read_ns) / 1e9, 3) if self.last_read_ns else None,
+            'chunk_latency': self.chunk_latency.snapshot()
+        }
+
+    def collect_metrics(self, out):
+        """Add this reader's counters to a PrometheusText collection."""
+        labels = {'reader': self.reader_id, 'gate': self.settings['gate']}
+        decoder = self.decoder
+        out.gauge('rfid_reader_running', "1 while the reader threads run", int(self.running), **labels)
+        out.counter('rfid_bytes_read_total', "Bytes read from the reader link", self.bytes_read, **labels)
+        out.counter('rfid_frames_total', "Valid tag frames, including repeats", self.frames_read, **labels)
+        out.counter('rfid_dedup_hits_total', "Tag frames for tags already seen", self.dedup_hits, **labels)
+        out.counter('rfid_invalid_frames_total', "Frames dropped for a bad header, length or checksum",
+                    decoder.invalid_frames if decoder else 0, **labels)
+        out.counter('rfid_resync_bytes_total', "Bytes skipped while resynchronising on a frame header",
+                    decoder.resync_bytes if decoder else 0, **labels)
+        out.counter('rfid_invalid_antenna_total', "Tag frames with an antenna port out of range",
+                    self.invalid_antenna, **labels)
+        out.counter('rfid_errors_total', "Exceptions in the read and processing threads", self.errors, **labels)
+        out.gauge('rfid_unique_tags', "Distinct EPCs seen", len(self.tag_store), **labels)
+        out.gauge('rfid_open_passes', "Passes still collecting reads for their peak RSSI",
+                  len(self.tag_store.pending), **labels)
+        data_queue = self.data_queue
+        out.gauge('rfid_data_queue_depth', "Chunks waiting for the processing thread",
+                  data_queue.qsize(), **labels)
+        out.gauge('rfid_data_queue_bytes', "Bytes waiting for the processing thread", data_queue.bytes, **labels)
+        out.counter('rfid_data_queue_dropped_bytes_total', "Bytes discarded by the data queue overflow policy",
+                    data_queue.dropped_bytes, **labels)
+        out.counter('rfid_data_queue_coalesced_total', "Chunks merged into the previous one because the queue was full",
+                    data_queue.coalesced_chunks, **labels)
+        out.histogram('rfid_chunk_latency_seconds', "Time from a chunk being read to it being parsed",
+                      self.chunk_latency, **labels)
+        out.histogram('rfid_lock_wait_seconds', "Time process_data waited for the reader lock when contended",
+                      self.lock_wait, **labels)
+        csv_writer = self.csv_writer
+        if csv_writer:
+            out.gauge('rfid_csv_queue_depth', "Rows waiting for the CSV writer", csv_writer.queue.qsize(), **labels)
+            out.counter('rfid_csv_rows_total', "Rows written to the CSV file", csv_writer.rows_written, **labels)
+            out.histogram('rfid_csv_flush_seconds', "Time to write one batch of CSV rows",
+                          csv_writer.flush_latency, **labels)
+        read_journal = self.read_journal
+        if read_journal:
+            out.gauge('rfid_read_journal_pending', "Reads waiting for the next group commit",
+                      len(read_journal.pending), **labels)
+            out.counter('rfid_read_journal_records_total', "Reads committed to the read journal",
+                        read_journal.records_written, **labels)
+            out.histogram('rfid_read_journal_commit_seconds', "Time of one group commit (write + fsync)",
+                          read_journal.commit_latency, **labels)
+        scheduler = self.scheduler
+        if scheduler:
+            out.counter('rfid_commands_sent_total', "Commands written to the reader", scheduler.commands_sent, **labels)
+            out.counter('rfid_command_ack_timeouts_total', "Commands without a response in time",
+                        scheduler.ack_timeouts, **labels)
+            out.counter('rfid_inventory_refreshes_total', "Inventory restarts", scheduler.refreshes, **labels)
+
+    def collect_shared_metrics(self, out):
+        """Add metrics of the journal and feed, which may be shared by several readers."""
+        journal = self.journal
+        if journal:
+            out.gauge('rfid_journal_queue_depth', "Events waiting for the journal writer", journal.queue.qsize())
+            out.counter('rfid_journal_events_total', "Events committed to the journal", journal.appended)
+            out.histogram('rfid_journal_flush_seconds', "Time to commit one batch of journal events",
+                          journal.flush_latency)
+        out.counter('rfid_stream_events_total', "Updates published to /stream clients", self.feed.last_id)
+
+    def publish_update(self, records=(), results=()):
+        """Push new tag records and leaderboard changes, with the current stats and status, to /stream clients."""
+        payload = {
+            'data': list(records),
+            'stats': (self.manager or self).get_stream_stats(),
+            'is_running': self.running
+        }
+        if results:
+            payload['results'] = list(results)  # Standings of runners who just got (re)ranked
+        self.feed.publish(payload, self.reader_id)
     
+    def inventory_commands(self):
+        """Commands that (re)start fast inventory on all antenna ports."""
+        # Stop any ongoing inventory
+        stop_cmd = bytearray([0xA0, 0x03, 0x00, 0xA3])
+
+        # Configure the reader to use all antenna ports (1 to num_antennas)
+        antenna_config_cmd = bytearray([0xA0, 0x0B, 0x00, self.num_antennas])
+        for i in range(1, self.num_antennas + 1):
+            antenna_config_cmd.append(i)  # Add antenna ports (1, 2, 3, ..., N)
+        antenna_config_cmd.extend([0x00] * (8 - self.num_antennas))  # Pad with zeros if necessary
+        antenna_config_cmd.append(0x00)  # Checksum placeholder (adjust as needed)
+
+        # Start fast inventory with all antenna ports
+        fast_inventory_cmd = bytearray([0xA0, 0x06, 0x01, 0xFF, 0x10, 0x20, 0xD6])
+
+        return [
+            ("stop inventory", stop_cmd),
+            ("antenna config", antenna_config_cmd),
+            ("fast inventory", fast_inventory_cmd)
+        ]
+
+    def send_commands(self, commands):
+        """Send ``(name, data)`` commands through the scheduler, or directly if it is not running."""
+        if self.scheduler and self.scheduler.running:
+            for name, data in commands:
+                self.scheduler.submit(name, data)
+        else:
+            for name, data in commands:
+                if callable(data):
+                    data()
+                else:
+                    self.transport.write(data)
+
     def start_fast_inventory(self):
-        """Send command to start fast inventory mode for Chaofan reader with all antenna ports."""
-        if self.serial_conn and self.serial_conn.is_open:
+        """Start fast inventory mode for Chaofan reader with all antenna ports."""
+        if self.transport and self.transport.is_open:
             try:
-                # Stop any ongoing inventory
-                stop_cmd = bytearray([0xA0, 0x03, 0x00, 0xA3])
-                self.serial_conn.write(stop_cmd)
-                time.sleep(0.1)
-
-                # Configure the reader to use all antenna ports (1 to num_antennas)
-                antenna_config_cmd = bytearray([0xA0, 0x0B, 0x00, self.num_antennas])
-                for i in range(1, self.num_antennas + 1):
-                    antenna_config_cmd.append(i)  # Add antenna ports (1, 2, 3, ..., N)
-                antenna_config_cmd.extend([0x00] * (8 - self.num_antennas))  # Pad with zeros if necessary
-                antenna_config_cmd.append(0x00)  # Checksum placeholder (adjust as needed)
-                self.serial_conn.write(antenna_config_cmd)
-                time.sleep(0.1)
-
-                # Start fast inventory with all antenna ports
-                fast_inventory_cmd = bytearray([0xA0, 0x06, 0x01, 0xFF, 0x10, 0x20, 0xD6])
-                self.serial_conn.write(fast_inventory_cmd)
+                if self.scheduler and self.scheduler.running:
+                    # Sent by the scheduler thread, which waits for each acknowledgement
+                    self.scheduler.request_refresh()
+                else:
+                    self.send_commands(self.inventory_commands())
 
-                print(f"Fast inventory started with {self.num_antennas} antenna ports.")
+                log.info("Fast inventory started with %d antenna ports", self.num_antennas, extra=self.log_fields)
                 return True
             except Exception as e:
-                print(f"Error starting fast inventory with antenna ports: {e}")
+                log.error("Error starting fast inventory: %s", e, extra=self.log_fields)
                 return False
         return False
     
     def retry_missed_tags(self):
         """Attempt to detect any potentially missed tags by restarting inventory with different parameters."""
-        if not self.serial_conn or not self.serial_conn.is_open:
+        if not self.transport or not self.transport.is_open:
             return False
             
         try:
-            # Stop current inventory
-            stop_cmd = bytearray([0xA0, 0x03, 0x00, 0xA3])
-            self.serial_conn.write(stop_cmd)
-            time.sleep(0.2)
+            self.send_commands([
+                # Stop current inventory
+                ("stop inventory", bytearray([0xA0, 0x03, 0x00, 0xA3])),
+                # Clear input buffer
+                ("reset input buffer", self.transport.reset_input_buffer),
+                # Set higher power (if supported by your reader)
+                ("set power", bytearray([0xA0, 0x07, 0x3B, 0x30, 0x00, 0x00, 0x12])),
+                # Start inventory with different parameters to catch missed tags
+                # Using alternative antenna settings and sensitivity
+                ("alt inventory", bytearray([0xA0, 0x06, 0x01, 0xF0, 0x10, 0x10, 0xC7]))
+            ])
             
-            # Clear input buffer
-            self.serial_conn.reset_input_buffer()
-            
-            # Set higher power (if supported by your reader)
-            power_cmd = bytearray([0xA0, 0x07, 0x3B, 0x30, 0x00, 0x00, 0x12])
-            self.serial_conn.write(power_cmd)
-            time.sleep(0.2)
-            
-            # Start inventory with different parameters to catch missed tags
-            # Using alternative antenna settings and sensitivity
-            alt_inventory_cmd = bytearray([0xA0, 0x06, 0x01, 0xF0, 0x10, 0x10, 0xC7])
-            self.serial_conn.write(alt_inventory_cmd)
-            
-            print("Retrying with alternate settings to detect missed tags")
+            log.info("Retrying with alternate settings to detect missed tags", extra=self.log_fields)
             return True
         except Exception as e:
-            print(f"Error in retry operation: {e}")
-            return False
\ No newline at end of file
+            log.error("Error in retry operation: %s", e, extra=self.log_fields)
+            return False
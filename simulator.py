@@ -0,0 +1,292 @@
+"""Hardware-free Chafon reader simulator and capture replay.
+
+Examples:
+    # Fake reader on a pty; point the app's serial port setting at the printed device
+    python simulator.py pty --tags 5000 --rate 2000
+
+    # Push synthetic reads through an in-process RFIDReader and report throughput
+    python simulator.py pipeline --tags 10000 --rate 20000 --duration 10
+
+    # Same, reporting the distribution of the delay from bytes arriving to frames being decoded
+    python simulator.py pipeline --tags 10000 --rate 20000 --duration 10 --measure-delay
+
+    # Replay a capture at 10x speed on a pty (use --speed 0 for as fast as possible)
+    python simulator.py pty --replay race.cap --speed 10
+"""
+import argparse
+import os
+import random
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+import config
+from frame_parser import encode_frame, frame_checksum
+from transport import ReplayTransport
+
+CAPTURE_MAGIC = b'RFIDCAP1'
+CAPTURE_RECORD = struct.Struct('<QI')  # Offset from the first chunk in ns, chunk length
+
+
+def ack_frame(value=0):
+    """Response frame the simulator sends for every command; byte 3 carries ``value``."""
+    frame = bytearray([config.FRAME_HEADER, 0x03, 0x00, value, 0x00])
+    frame[-1] = frame_checksum(frame)
+    return bytes(frame)
+
+
+class SimulatedTransport(ReplayTransport):
+    """In-memory transport that acknowledges every command like a reader would."""
+
+    def __init__(self, antennas=4, chunks=(), read_timeout=0.1):
+        super().__init__(chunks, read_timeout)
+        self.antennas = antennas
+
+    def write(self, data):
+        super().write(data)
+        self.feed(ack_frame(self.antennas))
+        return len(data)
+
+
+class TagSimulator:
+    """Generates a stream of valid tag frames for a population of tags.
+
+    Tags pass the antennas one after another (like runners crossing a
+    mat); each pass produces ``repeats`` reads spread over ``antennas``
+    with RSSI drawn from a normal distribution. ``noise`` is the chance,
+    per frame, of injecting random bytes or corrupting the frame.
+    """
+
+    def __init__(self, num_tags=1000, reads_per_second=1000, repeats=5, antennas=4,
+                 rssi_mean=60, rssi_stddev=8, noise=0.0, seed=None):
+        self.num_tags = num_tags
+        self.reads_per_second = reads_per_second
+        self.repeats = repeats
+        self.antennas = antennas
+        self.rssi_mean = rssi_mean
+        self.rssi_stddev = rssi_stddev
+        self.noise = noise
+        self.rng = random.Random(seed)
+        self.next_tag = 0
+        self.repeats_left = 0
+        self.frames_sent = 0
+
+    @staticmethod
+    def epc(index):
+        """EPC (12 bytes) of tag number ``index``."""
+        return b'\xE2\x00' + index.to_bytes(10, 'big')
+
+    def epc_hex(self, index):
+        return self.epc(index).hex().upper()
+
+    def frames(self, count):
+        """Return ``count`` frames (plus any injected noise) as one bytes object."""
+        rng = self.rng
+        out = bytearray()
+        for _ in range(count):
+            if self.repeats_left == 0:
+                self.next_tag = (self.next_tag + 1) % self.num_tags
+                self.repeats_left = self.repeats
+            self.repeats_left -= 1
+            rssi = min(255, max(0, int(rng.gauss(self.rssi_mean, self.rssi_stddev))))
+            frame = encode_frame(self.epc(self.next_tag), rssi, rng.randint(1, self.antennas))
+            if self.noise and rng.random() < self.noise:
+                if rng.random() < 0.5:
+                    out += rng.randbytes(rng.randint(1, 20))
+                else:
+                    corrupted = bytearray(frame)
+                    corrupted[rng.randrange(len(corrupted))] ^= 0xFF
+                    frame = bytes(corrupted)
+            out += frame
+        self.frames_sent += count
+        return bytes(out)
+
+    def run(self, sink, duration=None, stop_event=None, interval=0.01):
+        """Call ``sink(bytes)`` with paced batches until ``duration`` or ``stop_event``."""
+        start = time.monotonic()
+        sent = 0
+        while not (stop_event and stop_event.is_set()):
+            elapsed = time.monotonic() - start
+            if duration is not None and elapsed >= duration:
+                break
+            due = int(elapsed * self.reads_per_second) - sent
+            if due > 0:
+                sink(self.frames(due))
+                sent += due
+            time.sleep(interval)
+
+
+class CaptureWriter:
+    """Records chunks with their arrival time so they can be replayed later."""
+
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(CAPTURE_MAGIC)
+        self.first_ns = None
+
+    def write(self, data, arrival_ns):
+        if self.first_ns is None:
+            self.first_ns = arrival_ns
+        self.file.write(CAPTURE_RECORD.pack(arrival_ns - self.first_ns, len(data)))
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+
+def read_capture(path, baud_rate=config.DEFAULT_BAUD_RATE, chunk_size=256):
+    """Yield ``(offset_ns, chunk)`` from a capture file.
+
+    Files without the capture header are treated as raw byte logs and
+    paced at the given baud rate (10 bits per byte).
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(CAPTURE_MAGIC)) == CAPTURE_MAGIC:
+            while True:
+                header = f.read(CAPTURE_RECORD.size)
+                if len(header) < CAPTURE_RECORD.size:
+                    return
+                offset_ns, length = CAPTURE_RECORD.unpack(header)
+                yield offset_ns, f.read(length)
+        else:
+            f.seek(0)
+            ns_per_byte = 10 * 1_000_000_000 // baud_rate
+            position = 0
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield position * ns_per_byte, chunk
+                position += len(chunk)
+
+
+def replay(path, sink, speed=1.0, stop_event=None):
+    """Feed a capture to ``sink`` at ``speed`` times real time (0 = no pacing)."""
+    start = time.monotonic_ns()
+    for offset_ns, chunk in read_capture(path):
+        if stop_event and stop_event.is_set():
+            return
+        if speed:
+            delay = (start + offset_ns / speed - time.monotonic_ns()) / 1e9
+            if delay > 0:
+                time.sleep(delay)
+        sink(chunk)
+
+
+def answer_commands(read, sink, antennas, stop_event):
+    """Acknowledge every command written by the reader, like the real device does."""
+    while not stop_event.is_set():
+        data = read()
+        if data:
+            # The antenna query reads the port count from byte 3 of the answer
+            sink(ack_frame(antennas))
+
+
+def start_pty(args, source):
+    """Run ``source(sink, stop_event)`` against the master side of a new pty."""
+    import tty
+    master_fd, slave_fd = os.openpty()
+    tty.setraw(master_fd)
+    tty.setraw(slave_fd)
+    print(f"Simulated reader on {os.ttyname(slave_fd)}")
+    stop_event = threading.Event()
+    write_lock = threading.Lock()
+
+    def sink(data):
+        with write_lock:
+            os.write(master_fd, data)
+
+    def read():
+        try:
+            return os.read(master_fd, 4096)
+        except OSError:
+            return b''
+
+    threading.Thread(target=answer_commands, args=(read, sink, args.antennas, stop_event),
+                     daemon=True).start()
+    try:
+        source(sink, stop_event)
+        while args.replay and not stop_event.is_set():
+            time.sleep(1)  # Keep the pty open after the replay finished
+    except KeyboardInterrupt:
+        pass
+    stop_event.set()
+
+
+def run_pipeline(args, source):
+    """Drive an in-process RFIDReader from ``source`` and report throughput."""
+    from rfid_reader import RFIDReader
+
+    with tempfile.TemporaryDirectory() as tmp:
+        reader = RFIDReader()
+        # Every file of the run goes to a scratch directory: synthetic reads must
+        # never reach the real CSV, event journal or workbook, and each run
+        # starts from an empty read journal instead of recovering the previous one
+        reader.settings['output_file'] = os.path.join(tmp, 'rfid_data.xlsx')
+        reader.settings['csv_file'] = os.path.join(tmp, 'rfid_data.csv')
+        reader.settings['journal_file'] = os.path.join(tmp, 'rfid_events.db')
+        reader.settings['read_journal_file'] = os.path.join(tmp, 'rfid_reads.journal')
+        transport = SimulatedTransport(args.antennas)
+        reader.attach_transport(transport)
+        reader.start()
+        if args.measure_delay:
+            reader.measure_ingest_delay()
+        stop_event = threading.Event()
+        start = time.monotonic()
+        try:
+            source(transport.feed, stop_event)
+        except KeyboardInterrupt:
+            pass
+        # Let the processing thread catch up before measuring
+        while reader.data_queue.qsize():
+            time.sleep(0.01)
+        elapsed = time.monotonic() - start
+        reader.stop()
+        if reader.journal:
+            reader.journal.close()
+    health = reader.get_health()
+    print(f"{health['frames_read']:,} frames ({health['unique_tags']:,} tags) in {elapsed:.2f} s: "
+          f"{health['frames_read'] / elapsed:,.0f} frames/s")
+    if args.measure_delay:
+        delay = reader.measure_ingest_delay(False)
+        print("Ingest-to-decode delay: " + ', '.join(f"{key} {value}" for key, value in delay.items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulated Chafon UHF reader")
+    parser.add_argument('mode', choices=['pty', 'pipeline'])
+    parser.add_argument('--tags', type=int, default=1000, help="Tag population size")
+    parser.add_argument('--rate', type=int, default=1000, help="Reads per second")
+    parser.add_argument('--repeats', type=int, default=5, help="Reads per tag pass")
+    parser.add_argument('--antennas', type=int, default=4)
+    parser.add_argument('--rssi-mean', type=float, default=60)
+    parser.add_argument('--rssi-stddev', type=float, default=8)
+    parser.add_argument('--noise', type=float, default=0.0, help="Chance of line noise per frame")
+    parser.add_argument('--duration', type=float, default=None, help="Seconds to run (default: forever)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--replay', help="Capture or raw byte log to replay instead of synthetic reads")
+    parser.add_argument('--speed', type=float, default=1.0, help="Replay speed factor, 0 = unpaced")
+    parser.add_argument('--measure-delay', action='store_true',
+                        help="Pipeline mode: report the delay from bytes arriving to each frame being decoded")
+    args = parser.parse_args(argv)
+
+    if args.replay:
+        def source(sink, stop_event):
+            replay(args.replay, sink, args.speed, stop_event)
+    else:
+        simulator = TagSimulator(args.tags, args.rate, args.repeats, args.antennas,
+                                 args.rssi_mean, args.rssi_stddev, args.noise, args.seed)
+
+        def source(sink, stop_event):
+            simulator.run(sink, args.duration, stop_event)
+
+    if args.mode == 'pty':
+        start_pty(args, source)
+    else:
+        run_pipeline(args, source)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,11 +1,20 @@
 let eventSource;
+let leaderboardPage = 1;
+let leaderboardPages = 1;
+let leaderboardRefresh = null;
 
 // Connect to the server-sent events stream
 function connectStream() {
   eventSource = new EventSource("/stream");
   eventSource.onmessage = function (e) {
     const data = JSON.parse(e.data);
-    updateTable(data.data);
+    if (data.reset) {
+      clearTable();
+    }
+    appendRows(data.data);
+    if (data.results) {
+      scheduleLeaderboardRefresh();
+    }
     updateStats(data.stats);
     updateButtons(data.is_running);
   };
@@ -38,29 +47,34 @@ function updatePortStatus() {
   portStatus.style.color = status === "Connected" ? "green" : "red";
 }
 
-// Update the data table
-function updateTable(data) {
-  const table = document.getElementById("dataTable");
-  table.innerHTML = `
-                <tr>
-                    <th>Timestamp</th>
-                    <th>EPC</th>
-                    <th>RSSI</th>
-                    <th>Antenna</th>
-                </tr>
-                ${data
-                  .map(
-                    (row) => `
+// Remove all rows from the data table
+function clearTable() {
+  document.querySelector("#dataTable tbody").innerHTML = "";
+}
+
+// Append new reads to the data table (the stream only sends what is new)
+function appendRows(data) {
+  if (!data.length) {
+    return;
+  }
+  const tableBody = document.querySelector("#dataTable tbody");
+  tableBody.insertAdjacentHTML(
+    "beforeend",
+    data
+      .map(
+        (row) => `
                     <tr>
-                        <td>${row.timestamp}</td>
-                        <td>${row.epc}</td>
-                        <td>${row.rssi}</td>
-                        <td>${row.antenna}</td>
+                        <td class="p-3">${row.timestamp}</td>
+                        <td class="p-3">${row.epc}</td>
+                        <td class="p-3">${row.bib ?? ""}</td>
+                        <td class="p-3">${row.name ?? ""}</td>
+                        <td class="p-3">${row.rssi}</td>
+                        <td class="p-3">${row.antenna_port}</td>
                     </tr>
                 `
-                  )
-                  .join("")}
-            `;
+      )
+      .join("")
+  );
 }
 
 // Update statistics
@@ -126,8 +140,83 @@ async function importParticipants(e) {
     body: formData,
   });
   const result = await response.json();
-  alert(result.message);
-  fetchParticipants(); // Refresh participant list after import
+  if (!result.success) {
+    alert(result.message);
+    return;
+  }
+  pollImport(result.job_id);
+}
+
+// Follow a background import until it finishes
+async function pollImport(jobId) {
+  const status = document.getElementById("importStatus");
+  const response = await fetch(`/import_participants/${jobId}`);
+  const result = await response.json();
+  if (!result.success) {
+    status.textContent = result.message;
+    return;
+  }
+  const job = result.job;
+  if (job.state === "running") {
+    const percent = job.percent !== null ? ` (${job.percent}%)` : "";
+    status.textContent = `Importing: ${job.stage || "starting"}, ${job.done} rows${percent}`;
+    setTimeout(() => pollImport(jobId), 500);
+  } else if (job.state === "done") {
+    status.textContent = `Imported ${job.result.imported} participants`;
+    fetchParticipants(); // Refresh participant list after import
+  } else {
+    const rows = job.errors.slice(0, 10).map((e) => `Row ${e.row}: ${e.error}`).join("\n");
+    status.textContent = `Import failed: ${job.message}`;
+    alert(`Import failed: ${job.message}${rows ? "\n" + rows : ""}`);
+  }
+}
+
+// Download an export, waiting for the background job if it is not cached yet
+async function downloadExport(dataset, format = "xlsx") {
+  const status = document.getElementById(`${dataset}ExportStatus`);
+  const url = `/download_${dataset}?format=${format}`;
+  const response = await fetch(url);
+  if (response.status === 200) {
+    // Up to date copy: it was already sent, save it as such
+    saveBlob(await response.blob(), `${dataset}_data.${format}`);
+    status.textContent = "";
+    return;
+  }
+  const result = await response.json();
+  if (!result.success) {
+    status.textContent = result.message;
+    return;
+  }
+  pollExport(result.job_id, status);
+}
+
+// Follow an export job, then fetch its file
+async function pollExport(jobId, status) {
+  const response = await fetch(`/exports/${jobId}`);
+  const result = await response.json();
+  if (!result.success) {
+    status.textContent = result.message;
+    return;
+  }
+  const job = result.job;
+  if (job.state === "running") {
+    const percent = job.percent !== null ? ` (${job.percent}%)` : "";
+    status.textContent = `Exporting: ${job.done} rows${percent}`;
+    setTimeout(() => pollExport(jobId, status), 500);
+  } else if (job.state === "done") {
+    status.textContent = "";
+    window.location = result.download_url;
+  } else {
+    status.textContent = `Export failed: ${job.message}`;
+  }
+}
+
+function saveBlob(blob, filename) {
+  const link = document.createElement("a");
+  link.href = URL.createObjectURL(blob);
+  link.download = filename;
+  link.click();
+  URL.revokeObjectURL(link.href);
 }
 
 // Fetch and display participant data
@@ -165,6 +254,69 @@ function updateParticipantTable(data) {
     .join("");
 }
 
+// Fetch one page of the selected leaderboard view
+async function fetchLeaderboard() {
+  const view = document.getElementById("leaderboardView").value;
+  const params = new URLSearchParams({ page: leaderboardPage, per_page: 50 });
+  if (view) {
+    const [kind, value] = view.split(":");
+    params.set(kind, value);
+  }
+  const response = await fetch(`/leaderboard?${params}`);
+  const result = await response.json();
+  if (!result.success) {
+    return;
+  }
+  leaderboardPages = Math.max(1, Math.ceil(result.total / result.per_page));
+  document.getElementById("leaderboardPageInfo").textContent =
+    `Page ${result.page} of ${leaderboardPages} (${result.total} ranked)`;
+  updateLeaderboardViews(result.groups);
+  document.querySelector("#leaderboardTable tbody").innerHTML = result.data
+    .map(
+      (row) => `
+                <tr>
+                    <td class="p-3">${row.rank}</td>
+                    <td class="p-3">${row.bib ?? ""}</td>
+                    <td class="p-3">${row.name ?? ""}</td>
+                    <td class="p-3">${row.gender ?? ""}</td>
+                    <td class="p-3">${row.category ?? ""}</td>
+                    <td class="p-3">${row.duration}</td>
+                </tr>
+            `
+    )
+    .join("");
+}
+
+// Offer one option per gender and category that has ranked runners
+function updateLeaderboardViews(groups) {
+  const select = document.getElementById("leaderboardView");
+  const current = select.value;
+  const options = ['<option value="">Overall</option>'];
+  for (const kind of ["gender", "category"]) {
+    for (const [value, count] of Object.entries(groups[kind])) {
+      options.push(`<option value="${kind}:${value}">${kind}: ${value} (${count})</option>`);
+    }
+  }
+  select.innerHTML = options.join("");
+  select.value = current;
+}
+
+function changeLeaderboardPage(step) {
+  leaderboardPage = Math.min(leaderboardPages, Math.max(1, leaderboardPage + step));
+  fetchLeaderboard();
+}
+
+// Re-fetch the visible page at most twice a second while finishes stream in
+function scheduleLeaderboardRefresh() {
+  if (leaderboardRefresh || document.getElementById("results").style.display !== "block") {
+    return;
+  }
+  leaderboardRefresh = setTimeout(() => {
+    leaderboardRefresh = null;
+    fetchLeaderboard();
+  }, 500);
+}
+
 // Open a specific tab
 function openTab(tabName) {
   const tabs = document.querySelectorAll(".tab-content");
@@ -173,6 +325,8 @@ function openTab(tabName) {
 
   if (tabName === "participants") {
     fetchParticipants(); // Fetch and display participants
+  } else if (tabName === "results") {
+    fetchLeaderboard();
   }
 }
 
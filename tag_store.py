@@ -0,0 +1,181 @@
+from collections import deque
+from datetime import datetime
+
+import config
+
+
+_second_prefix = (None, '')  # (epoch second, its 'YYYY-mm-dd HH:MM:SS') of the last call
+
+
+def format_timestamp_ns(time_ns):
+    """Local 'YYYY-mm-dd HH:MM:SS.ffffff' for epoch nanoseconds, without float rounding.
+
+    Reads come in bursts within the same second, so the date and time part
+    is formatted once per second and reused.
+    """
+    global _second_prefix
+    seconds, ns = divmod(time_ns, 1_000_000_000)
+    cached_seconds, prefix = _second_prefix
+    if seconds != cached_seconds:
+        prefix = f"{datetime.fromtimestamp(seconds):%Y-%m-%d %H:%M:%S}"
+        _second_prefix = (seconds, prefix)  # One assignment, safe across threads
+    return f"{prefix}.{ns // 1000:06d}"
+
+
+class TagRead:
+    """One accepted read, as compact as it gets.
+
+    The EPC is kept as its 12 raw bytes (the same object the TagStore is
+    keyed by) and the time as integer epoch nanoseconds; hex strings and
+    formatted timestamps are only produced when a read leaves the process
+    (API, CSV, journal).
+    """
+
+    __slots__ = ('epc', 'time_ns', 'rssi', 'antenna')
+
+    def __init__(self, epc, time_ns, rssi, antenna):
+        self.epc = epc
+        self.time_ns = time_ns
+        self.rssi = rssi
+        self.antenna = antenna
+
+    @property
+    def epc_hex(self):
+        return self.epc.hex().upper()
+
+    @property
+    def time_us(self):
+        return self.time_ns // 1000
+
+    def timestamp(self):
+        return format_timestamp_ns(self.time_ns)
+
+
+class TagEntry:
+    """Aggregated reads of a single EPC; times are epoch nanoseconds."""
+
+    __slots__ = ('epc', 'first_seen', 'last_seen', 'read_count', 'peak_rssi', 'peak_seen', 'antenna', 'passes',
+                 'open_pass')
+
+    def __init__(self, epc, rssi, antenna, now):
+        self.epc = epc
+        self.first_seen = now  # Start of the current pass
+        self.last_seen = now
+        self.read_count = 1
+        self.peak_rssi = rssi
+        self.peak_seen = now  # Time of the peak RSSI read: the chip time of the pass
+        self.antenna = antenna  # Antenna that reported the peak RSSI
+        self.passes = 1
+        self.open_pass = False  # True while the current pass waits in TagStore.pending
+
+    def to_dict(self):
+        return {
+            'epc': self.epc.hex().upper(),
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'read_count': self.read_count,
+            'peak_rssi': self.peak_rssi,
+            'peak_seen': self.peak_seen,
+            'antenna': self.antenna,
+            'passes': self.passes
+        }
+
+
+class TagStore:
+    """EPC-keyed index of every tag seen in the session.
+
+    Keys are the raw EPC bytes, so a repeat read costs no hex conversion.
+    Lookups and updates are a single dict access. A tag that stays silent
+    for longer than ``reread_window`` seconds and is then read again starts
+    a new pass; with a window of 0 each EPC is only ever new once.
+
+    With a ``pass_window`` the crossing is not reported at the first read:
+    reads are collected for that many seconds and ``expire`` then returns
+    the pass as a TagRead at the time, RSSI and antenna of its strongest
+    read, which is when the tag was closest to an antenna. Open passes
+    wait in a deque ordered by deadline, so memory is bounded by the tags
+    seen within one window and expiry only looks at passes that are due.
+    If a new pass starts (``reread_window`` shorter than ``pass_window``)
+    while the previous one is still open, the previous one is closed at
+    its peak so far and reported by the next ``expire``.
+
+    Not thread-safe on its own; callers hold the reader lock.
+    """
+
+    def __init__(self, reread_window=config.REREAD_WINDOW, pass_window=config.PASS_WINDOW):
+        self.reread_window = reread_window
+        self.reread_window_ns = int(reread_window * 1_000_000_000)
+        self.pass_window_ns = int(pass_window * 1_000_000_000)
+        self.tags = {}
+        self.pending = deque()  # (deadline, entry, pass number) of open passes, oldest first
+
+    def update(self, epc, rssi, antenna, now_ns):
+        """Record a read and return ``(entry, is_new)``.
+
+        ``is_new`` is True for the first read of an EPC and for the first
+        read of every later pass; with a pass window the pass is then
+        reported by ``expire``.
+        """
+        entry = self.tags.get(epc)
+        if entry is None:
+            entry = self.tags[epc] = TagEntry(epc, rssi, antenna, now_ns)
+            if self.pass_window_ns:
+                self.pending.append((now_ns + self.pass_window_ns, entry, 1))
+                entry.open_pass = True
+            return entry, True
+
+        is_new = False
+        if self.reread_window_ns and now_ns - entry.last_seen > self.reread_window_ns:
+            if entry.open_pass:
+                self._close_early(entry, now_ns)
+            entry.first_seen = now_ns
+            entry.peak_rssi = rssi
+            entry.peak_seen = now_ns
+            entry.antenna = antenna
+            entry.passes += 1
+            is_new = True
+            if self.pass_window_ns:
+                self.pending.append((now_ns + self.pass_window_ns, entry, entry.passes))
+                entry.open_pass = True
+        elif rssi > entry.peak_rssi and (not self.pass_window_ns
+                                         or now_ns - entry.first_seen <= self.pass_window_ns):
+            entry.peak_rssi = rssi
+            entry.peak_seen = now_ns
+            entry.antenna = antenna
+        entry.last_seen = now_ns
+        entry.read_count += 1
+        return entry, is_new
+
+    def expire(self, now_ns=None):
+        """Close the passes whose window ended by ``now_ns`` (all of them if None).
+
+        Returns one TagRead per closed pass, stamped with its peak RSSI read.
+        """
+        pending = self.pending
+        reads = []
+        while pending and (now_ns is None or pending[0][0] <= now_ns):
+            _, entry, number = pending.popleft()
+            if entry.passes == number:  # Otherwise the pass was closed early (see _close_early)
+                entry.open_pass = False
+                reads.append(TagRead(entry.epc, entry.peak_seen, entry.peak_rssi, entry.antenna))
+        return reads
+
+    def _close_early(self, entry, now_ns):
+        """Queue the open pass of ``entry`` as due now, before a new pass overwrites its peak."""
+        closed = TagEntry(entry.epc, entry.peak_rssi, entry.antenna, entry.peak_seen)
+        closed.passes = entry.passes
+        # At the front and due at once: the next expire() reports it
+        self.pending.appendleft((now_ns, closed, closed.passes))
+
+    def get(self, epc):
+        return self.tags.get(epc)
+
+    def clear(self):
+        self.tags.clear()
+        self.pending.clear()
+
+    def __contains__(self, epc):
+        return epc in self.tags
+
+    def __len__(self):
+        return len(self.tags)
@@ -0,0 +1,50 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+
+
+def first_event(response):
+    try:
+        return next(iter(response.response)).decode()
+    finally:
+        response.close()
+
+
+def payload(event):
+    return json.loads(event.split('data: ', 1)[1])
+
+
+def test_new_client_gets_reset_snapshot():
+    response = app.app.test_client().get('/stream', buffered=False)
+    assert response.status_code == 200
+    message = payload(first_event(response))
+    assert message['reset'] is True
+    assert message['data'] == []
+    assert 'stats' in message
+
+
+def test_client_behind_retained_log_gets_new_snapshot():
+    feed = app.reader.feed
+    max_messages = feed.max_messages
+    feed.max_messages = 4
+    try:
+        feed.publish({'data': []})
+        feed.publish({'data': []})
+        response = app.app.test_client().get(
+            '/stream', headers={'Last-Event-ID': str(feed.last_id - 1)}, buffered=False)
+        events = iter(response.response)
+        try:
+            assert next(events).decode().startswith(f"id: {feed.last_id}\n")  # Resumed, no snapshot
+            for _ in range(10):  # Pushes the client's cursor out of the log
+                feed.publish({'data': []})
+            event = next(events).decode()
+        finally:
+            response.close()
+    finally:
+        feed.max_messages = max_messages
+    assert event.startswith(f"id: {feed.last_id}\n")
+    assert payload(event)['reset'] is True
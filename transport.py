@@ -0,0 +1,194 @@
+import os
+import time
+import threading
+import selectors
+from collections import deque
+
+import serial
+
+
+class Transport:
+    """Byte-stream link to a reader.
+
+    ``read`` blocks until at least one byte is available (or ``timeout``
+    seconds pass) and then returns everything that is buffered, up to
+    ``max_bytes``. An empty result means the timeout expired.
+    """
+
+    is_open = False
+    arrival_ns = None  # time.monotonic_ns() at which the last chunk arrived, if the transport stamps it itself
+
+    def read(self, max_bytes=4096, timeout=None):
+        raise NotImplementedError
+
+    def read_at_least(self, min_bytes, max_bytes=4096, timeout=None):
+        """Read until ``min_bytes`` have arrived or ``timeout`` expires; may return fewer.
+
+        For command responses: ``read`` returns as soon as the first bytes
+        are in, which at serial speeds is usually only part of a response.
+        """
+        deadline = time.monotonic() + (timeout or 0)
+        data = b''
+        while len(data) < min_bytes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            chunk = self.read(max_bytes - len(data), timeout=remaining)
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def write(self, data):
+        raise NotImplementedError
+
+    def reset_input_buffer(self):
+        """Discard any bytes received but not yet read."""
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
+class SerialTransport(Transport):
+    """Transport backed by a pyserial port."""
+
+    def __init__(self, port, baud_rate=57600, read_timeout=0.1):
+        self.conn = serial.Serial(
+            port=port,
+            baudrate=baud_rate,
+            parity=serial.PARITY_NONE,
+            stopbits=serial.STOPBITS_ONE,
+            bytesize=serial.EIGHTBITS,
+            timeout=read_timeout,  # Upper bound on how long read() blocks
+            write_timeout=2,  # Set write timeout
+            rtscts=True,  # Enable hardware flow control (if supported)
+            dsrdtr=True  # Enable hardware flow control (if supported)
+        )
+
+    @property
+    def is_open(self):
+        return self.conn.is_open
+
+    def read(self, max_bytes=4096, timeout=None):
+        if timeout is not None and self.conn.timeout != timeout:
+            self.conn.timeout = timeout
+        # Block on the first byte so we wake as soon as data arrives,
+        # then drain whatever else the driver already has buffered.
+        first = self.conn.read(1)
+        if not first:
+            return b''
+        waiting = min(self.conn.in_waiting, max_bytes - 1)
+        if waiting > 0:
+            return first + self.conn.read(waiting)
+        return first
+
+    def write(self, data):
+        return self.conn.write(data)
+
+    def reset_input_buffer(self):
+        self.conn.reset_input_buffer()
+
+    def close(self):
+        self.conn.close()
+
+
+class PtyTransport(Transport):
+    """Transport over a raw file descriptor, e.g. one end of a pty (POSIX only)."""
+
+    def __init__(self, fd, read_timeout=0.1):
+        self.fd = fd
+        self.read_timeout = read_timeout
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(fd, selectors.EVENT_READ)
+        self.is_open = True
+
+    @classmethod
+    def open_pair(cls, read_timeout=0.1):
+        """Create a pty and return ``(transport, peer_fd, peer_name)``.
+
+        The transport reads from the master side; anything written to
+        ``peer_fd`` (or to the device at ``peer_name``) shows up there.
+        """
+        import tty
+        master_fd, slave_fd = os.openpty()
+        tty.setraw(master_fd)
+        tty.setraw(slave_fd)
+        return cls(master_fd, read_timeout), slave_fd, os.ttyname(slave_fd)
+
+    def read(self, max_bytes=4096, timeout=None):
+        if not self.is_open:
+            return b''
+        if timeout is None:
+            timeout = self.read_timeout
+        if not self.selector.select(timeout):
+            return b''
+        try:
+            return os.read(self.fd, max_bytes)
+        except OSError:
+            # The peer side was closed
+            return b''
+
+    def write(self, data):
+        return os.write(self.fd, bytes(data))
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            self.selector.close()
+            os.close(self.fd)
+
+
+class ReplayTransport(Transport):
+    """In-memory transport fed from pre-recorded chunks or by ``feed()``.
+
+    Bytes written by the reader (commands) are kept in ``written`` so
+    tests and simulators can inspect them.
+    """
+
+    def __init__(self, chunks=(), read_timeout=0.1):
+        self.read_timeout = read_timeout
+        self.pending = deque(bytes(c) for c in chunks)
+        self.cond = threading.Condition()
+        self.written = []
+        self.is_open = True
+
+    def feed(self, data):
+        """Make ``data`` available to the next ``read``."""
+        with self.cond:
+            self.pending.append(bytes(data))
+            self.cond.notify()
+
+    def read(self, max_bytes=4096, timeout=None):
+        if timeout is None:
+            timeout = self.read_timeout
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while not self.pending:
+                remaining = deadline - time.monotonic()
+                if not self.is_open or remaining <= 0:
+                    return b''
+                self.cond.wait(remaining)
+
+            out = bytearray()
+            while self.pending and len(out) < max_bytes:
+                chunk = self.pending.popleft()
+                room = max_bytes - len(out)
+                if len(chunk) > room:
+                    self.pending.appendleft(chunk[room:])
+                    chunk = chunk[:room]
+                out += chunk
+            return bytes(out)
+
+    def write(self, data):
+        self.written.append(bytes(data))
+        return len(data)
+
+    def reset_input_buffer(self):
+        with self.cond:
+            self.pending.clear()
+
+    def close(self):
+        with self.cond:
+            self.is_open = False
+            self.cond.notify_all()
@@ -0,0 +1,104 @@
+import json
+import threading
+
+import config
+
+
+class UpdateFeed:
+    """Ordered log of server-sent events shared by every /stream client.
+
+    Each update is serialized once, when it is published, into a complete
+    SSE message whose ``id`` is its position in the log. Clients keep
+    their own cursor (the last id they received) and only ever get the
+    messages after it, so a reconnecting browser resumes from its
+    ``Last-Event-ID`` instead of downloading everything again.
+
+    Only the last ``max_messages`` messages are kept. A client whose
+    cursor is older than that (or unknown) starts over from a snapshot of
+    the reads instead: ``position`` tells how many records each source has
+    published up to a given id, so the snapshot and the cursor match
+    exactly.
+    """
+
+    def __init__(self, max_messages=config.FEED_HISTORY):
+        self.cond = threading.Condition()
+        self.max_messages = max_messages
+        self.messages = []  # messages[n] carries event id first_id + n
+        self.first_id = 1
+        self.records = {}  # source -> records published since its last reset
+        self.listeners = []  # Callables run after every publish, e.g. to wake an event loop
+
+    @property
+    def last_id(self):
+        return self.first_id + len(self.messages) - 1
+
+    def publish(self, payload, source=None):
+        """Serialize ``payload`` and wake every waiting client. Returns its event id.
+
+        ``source`` (a reader id) is credited with the records in ``payload['data']``.
+        """
+        data = json.dumps(payload)
+        with self.cond:
+            event_id = self._append(data)
+            records = payload.get('data')
+            if records:
+                self.records[source] = self.records.get(source, 0) + len(records)
+        self._notify()
+        return event_id
+
+    def publish_reset(self, make_payload):
+        """Publish ``make_payload(records)``, a message that replaces the clients' state.
+
+        ``records`` is what ``position`` returns; the payload is built
+        under the feed lock, so no update can slip in between.
+        """
+        with self.cond:
+            event_id = self._append(json.dumps(make_payload(dict(self.records))))
+        self._notify()
+        return event_id
+
+    def reset_source(self, source):
+        """Forget the records ``source`` published, e.g. after its reads were cleared."""
+        with self.cond:
+            self.records.pop(source, None)
+
+    def position(self):
+        """``(last_id, records)``: the newest id and, per source, the records published up to it."""
+        with self.cond:
+            return self.last_id, dict(self.records)
+
+    def _append(self, data):
+        event_id = self.last_id + 1
+        self.messages.append(f"id: {event_id}\ndata: {data}\n\n")
+        self.cond.notify_all()
+        excess = len(self.messages) - self.max_messages
+        if excess > self.max_messages // 4:  # Trimmed in batches, not on every publish
+            del self.messages[:excess]
+            self.first_id += excess
+        return event_id
+
+    def _notify(self):
+        for listener in self.listeners:
+            listener()
+
+    def subscribe(self, listener):
+        """Call ``listener()`` (from the publishing thread) after each publish."""
+        self.listeners.append(listener)
+
+    def covers(self, cursor):
+        """True if a client at ``cursor`` can resume from the log."""
+        return self.first_id - 1 <= cursor <= self.last_id
+
+    def read(self, cursor, timeout=None):
+        """Return ``(messages, new_cursor)`` for everything after ``cursor``.
+
+        Blocks up to ``timeout`` seconds when nothing new is available.
+        ``messages`` is None if ``cursor`` is no longer (or was never) in
+        the log; the client then needs a fresh snapshot.
+        """
+        with self.cond:
+            if cursor == self.last_id:
+                self.cond.wait(timeout)
+            if not self.covers(cursor):
+                return None, self.last_id
+            return self.messages[cursor - self.first_id + 1:], self.last_id